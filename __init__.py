@@ -4,11 +4,78 @@ SEE
 
 Functions
 ---------
+App(dev=False, cmd=False) -> App
+use_app(app) -> with block, yields app
+current_app() -> App
 get_dev_mode() -> bool
 set_dev_mode(onoff_flag=True) -> None
 user_quit(event, key_pressed, key_mods) -> bool
 user_opens_cmdline(key_pressed, key_mods) -> bool
 user_closes_cmdline(key_pressed) -> bool
+user_toggles_recording(key_pressed) -> bool
+make_offscreen(cols=640, rows=480) -> Surface
+Offscreen(cols=640, rows=480).render() -> numpy.ndarray
+evaluate(cmd) -> str
+register_command(name, func, help='') -> None
+declare_command(name, module, function, help='') -> None
+load_command_manifest(path) -> None
+prewarm_commands() -> threading.Thread
+complete_command(prefix) -> list
+get_ui_managers() -> list
+AcquisitionProcess(worker, n_pixels).start() -> None
+RemoteServer(address=None, handler=None).process() -> int
+RemoteClient(address).run(*commands) -> list
+scheduler.call_later(delay, func, *args) -> Timer
+scheduler.call_every(interval, func, *args) -> Timer
+scheduler.run_due() -> int
+Waterfall(rect, vmin, vmax).add_row(counts) -> None
+badwolf_lut(names, size=256) -> numpy.ndarray
+Pipeline(n_pixels, stages).process(counts) -> numpy.ndarray
+load_calibrations(path) -> list
+get_calibration(cal_id).to_wavelength(pixels) -> numpy.ndarray
+watch_theme(manager, path=None, interval=0.5) -> ThemeWatcher
+ElementPool(manager).acquire(element_type, relative_rect) -> UIElement
+IndexedUIManager(window_resolution).element_at(pos) -> UIElement
+bindings.bind_text(observable, element, format='{}') -> Binding
+bindings.flush() -> int
+scripts.source(path, variables=None) -> ScriptRun
+sampling_profiler.start(seconds=None, rate=100, fmt='collapsed') -> None
+TraceIndex(x).region(x0, x1) -> RegionStats
+WindowSet(theme).open(title, size, position=None) -> AppWindow
+latency_tracer.report() -> dict
+render_text(font, text, antialias, colour, background=None) -> Surface
+text_cache.stats() -> dict
+ui_stats.report() -> dict
+capture_frame(surface) -> None
+toggle_recording() -> str
+SweepRecorder(path, wavelengths).append(counts) -> None
+open_recording(path) -> Recording
+MinMaxPyramid.open(path).update(data) -> None
+LodViewer(pyramid, data, rect).draw(surface) -> None
 get_arg(swp) -> str
 """
 from .makeuppy import *
+from .textcache import *
+from .capture import *
+from .sweeps import *
+from .lod import *
+from .stats import *
+from .acquisition import *
+from .remote import *
+from .timers import *
+from .waterfall import *
+from .pipeline import *
+from .calibration import *
+from .themewatch import *
+from .pool import *
+from .spatial import *
+from .bindings import *
+from .script import *
+from .profiler import *
+from .traceindex import *
+from .windows import *
+from .latency import *
+
+# pgui.DEV and pgui.CMD read and write the current App
+import sys as _sys
+_sys.modules[__name__].__class__ = makeuppy._AppModule
@@ -0,0 +1,246 @@
+"""Run acquisition and processing in a child process, plot from shared memory.
+
+The child process writes each sweep into a ring of shared-memory slots.
+The GUI reads the newest slot as a NumPy view of the same memory, so
+sweeps are never copied or pickled. The GUI sends COLON commands to the
+child over a pipe, the same way 'evaluate' handles them in one process.
+
+Handshake
+---------
+Each slot has a sequence number. The child sets it to -1 while it
+writes the slot and to the sweep number when the sweep is complete. The
+GUI reads the sweep number, uses the view, then checks with 'valid()'
+that the slot was not reused in the meantime.
+
+Example
+-------
+# Child process: must be a module-level function
+def acquire(link):
+    running = False
+    def start(args):
+        nonlocal running; running = True
+        return 'OK: sweep started'
+    link.commands['start'] = start
+    while link.poll(): # handle commands, False when GUI stops us
+        if running:
+            seq, counts = link.slots.begin() # view into shared memory
+            counts[:] = read_detector() - dark # process in place
+            link.slots.commit(seq)
+
+# GUI process
+import makeuppy as mukpy
+acq = mukpy.AcquisitionProcess(acquire, n_pixels=2048)
+acq.start()
+acq.register_commands('start') # ':start' now goes to the child
+# ...every frame...
+seq, counts = acq.slots.latest()
+if seq is not None:
+    plot(counts)
+    if not acq.slots.valid(seq): pass # slot was reused mid-plot: drop frame
+# ...on quit...
+acq.stop()
+"""
+import numpy as np
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+from . import makeuppy as _mukpy
+
+class SweepSlots:
+    """Ring of 'n_slots' sweeps of 'n_pixels' in a shared memory block.
+
+    Behavior
+    --------
+    latest() returns (None, None) before the first commit
+    latest() returns the newest committed sweep as a view, not a copy
+    valid(seq) is False once sweep 'seq' is overwritten
+
+    Parameters
+    ----------
+    shm:
+        multiprocessing.shared_memory.SharedMemory of at least
+        SweepSlots.nbytes(n_slots, n_pixels, dtype) bytes.
+    """
+    def __init__(self, shm, n_slots, n_pixels, dtype='f8'):
+        self.shm = shm
+        self.n_slots = n_slots
+        header = np.ndarray((1 + n_slots,), dtype=np.int64, buffer=shm.buf)
+        self._latest = header[:1]
+        self._seq = header[1:]
+        self.counts = np.ndarray(
+            (n_slots, n_pixels), dtype=dtype,
+            buffer=shm.buf, offset=header.nbytes
+            )
+
+    @staticmethod
+    def nbytes(n_slots, n_pixels, dtype='f8'): # -> int
+        return 8*(1 + n_slots) + n_slots*n_pixels*np.dtype(dtype).itemsize
+
+    def reset(self):
+        self._latest[0] = -1
+        self._seq[:] = -1
+
+    # ---Writer (child process)---
+    def begin(self): # -> (seq, view)
+        """Return the next sweep number and a writable view of its slot."""
+        seq = int(self._latest[0]) + 1
+        self._seq[seq % self.n_slots] = -1 # slot is being written
+        return seq, self.counts[seq % self.n_slots]
+
+    def commit(self, seq):
+        """Publish sweep 'seq' written into the view from 'begin()'."""
+        self._seq[seq % self.n_slots] = seq
+        self._latest[0] = seq
+
+    def publish(self, counts):
+        """Copy 'counts' into the next slot and commit it."""
+        seq, slot = self.begin()
+        slot[:] = counts
+        self.commit(seq)
+        return seq
+
+    # ---Reader (GUI process)---
+    def latest(self): # -> (seq, view)
+        """Return the newest complete sweep number and a read-only view of it."""
+        seq = int(self._latest[0])
+        if seq < 0 or not self.valid(seq): return None, None
+        view = self.counts[seq % self.n_slots]
+        view.flags.writeable = False
+        return seq, view
+
+    def valid(self, seq): # -> bool
+        """Return True if the slot still holds sweep 'seq'."""
+        return int(self._seq[seq % self.n_slots]) == seq
+
+class AcquisitionLink:
+    """What the child process gets: shared slots, commands and the pipe.
+
+    Attributes
+    ----------
+    slots:
+        SweepSlots to write sweeps into.
+    commands:
+        dict {name: func}. 'poll()' calls func(args) for each COLON
+        command the GUI sends and sends back the returned string.
+    """
+    def __init__(self, slots, conn):
+        self.slots = slots
+        self.commands = {}
+        self.running = True
+        self._conn = conn
+
+    def poll(self, timeout=0): # -> bool
+        """Handle pending commands. Return False when the GUI calls 'stop()'."""
+        while self.running and self._conn.poll(timeout):
+            timeout = 0
+            ident, name, args = self._conn.recv()
+            if name is None: self.running = False; break
+            command = self.commands.get(name)
+            if command is None: response = f"ERROR: no command ':{name}' in acquisition process"
+            else:
+                try: response = command(args)
+                except Exception as error: response = f"ERROR: {error}"
+            self._conn.send((ident, response))
+        return self.running
+
+class AcquisitionProcess:
+    """Start 'worker(link)' in a child process that shares sweep slots with the GUI.
+
+    Parameters
+    ----------
+    worker:
+        Module-level function called in the child with an
+        AcquisitionLink. Return from it when 'link.poll()' is False.
+    n_pixels:
+        type: int
+        Length of one sweep.
+    n_slots:
+        type: int
+        Sweeps kept in the ring. More slots give the GUI longer to
+        read a sweep before the child reuses its slot.
+    dtype:
+        Data type of the counts.
+    timeout:
+        Seconds 'send()' waits for the child to reply.
+    """
+    def __init__(self, worker, n_pixels, n_slots=8, dtype='f8', timeout=1.0):
+        self.worker = worker
+        self.n_pixels = n_pixels
+        self.n_slots = n_slots
+        self.dtype = dtype
+        self.timeout = timeout
+        self.slots = None
+        self.process = None
+        self._shm = None
+        self._conn = None
+        self._sent = 0 # id of the last command sent, to match answers
+
+    def start(self):
+        """Make the shared slots and start the child process."""
+        self._shm = shared_memory.SharedMemory(
+            create=True,
+            size=SweepSlots.nbytes(self.n_slots, self.n_pixels, self.dtype)
+            )
+        self.slots = SweepSlots(self._shm, self.n_slots, self.n_pixels, self.dtype)
+        self.slots.reset()
+        self._conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_run_worker,
+            args=(self.worker, self._shm.name, self.n_slots, self.n_pixels, self.dtype, child_conn),
+            daemon=True
+            )
+        self.process.start()
+
+    def send(self, name, args=''): # -> str
+        """Send COLON command ':name args' to the child and return its response."""
+        if self.process is None or not self.process.is_alive():
+            return "ERROR: acquisition process is not running"
+        self._sent += 1
+        self._conn.send((self._sent, name, args))
+        deadline = time.monotonic() + self.timeout
+        while self._conn.poll(max(deadline - time.monotonic(), 0)):
+            ident, response = self._conn.recv()
+            if ident == self._sent: return response
+            # else: late answer to a command that already timed out
+        return f"ERROR: acquisition process did not answer ':{name}'"
+
+    def register_commands(self, *names):
+        """Make 'evaluate' forward each COLON command in 'names' to the child."""
+        for name in names:
+            _mukpy.register_command(
+                name,
+                lambda args, name=name: self.send(name, args),
+                'Sent to the acquisition process'
+                )
+
+    def stop(self):
+        """Ask the child to return, then free the shared memory.
+
+        Views from 'slots.latest()' the GUI still holds (e.g. the
+        last frame of a plot) stay readable: the memory is unmapped
+        when the last of them goes.
+        """
+        if self.process is None: return
+        if self.process.is_alive():
+            self._conn.send((0, None, ''))
+            self.process.join(self.timeout)
+            if self.process.is_alive(): self.process.terminate()
+        self.process = None
+        self.slots = None
+        # Do not unmap under views the GUI still holds: close() would
+        # raise BufferError, or unmap them if NumPy released its buffer
+        # export. Dropping the references unmaps when the last view goes.
+        self._shm._buf = self._shm._mmap = None
+        self._shm.close() # closes the file descriptor
+        self._shm.unlink()
+        self._shm = None
+
+def _run_worker(worker, shm_name, n_slots, n_pixels, dtype, conn):
+    """Child process entry point."""
+    # Child shares the GUI's resource tracker: the GUI unlinks the memory.
+    shm = shared_memory.SharedMemory(name=shm_name)
+    link = AcquisitionLink(SweepSlots(shm, n_slots, n_pixels, dtype), conn)
+    try: worker(link)
+    finally:
+        link.slots = None
+        shm.close()
@@ -0,0 +1,156 @@
+"""Bind model values to widget text, colour and visibility, updated once per frame.
+
+Calling 'set_text' re-renders the element right away. A value that
+changes a thousand times per second (sweep counter, status line,
+temperature) re-renders a thousand times, but only the last value is
+ever seen.
+
+An Observable holds a model value. Setting it only marks the bindings
+that follow it as dirty. 'bindings.flush()', once per frame, applies
+the latest value of each dirty binding, and skips values that are
+the same as what the widget already shows. A counter updated 1,000
+times a second costs one re-render per frame.
+
+Observables can be set from any thread; flush() runs on the UI thread.
+
+Example
+-------
+import makeuppy as mukpy
+sweeps = mukpy.Observable(0)
+status = mukpy.Observable('idle')
+mukpy.bindings.bind_text(sweeps, readout, '{} sweeps')
+mukpy.bindings.bind_colour(status, cmdoutput, lambda s:
+    color_hex.taffy if s == 'error' else color_hex.saltwatertaffy)
+mukpy.bindings.bind_visible(status, error_popup, lambda s: s == 'error')
+# ...in the acquisition loop, as often as you like...
+sweeps.set(sweeps.get() + 1)
+# ...once per frame, before manager.update()...
+mukpy.bindings.flush()
+"""
+import threading
+import pygame
+from . import pool as _pool
+
+class Observable:
+    """A model value that bound widgets follow.
+
+    Behavior
+    --------
+    set() with the value it already has does nothing
+    set() marks bindings dirty; widgets change at the next flush()
+    """
+    def __init__(self, value=None):
+        self._value = value
+        self._bindings = []
+
+    def get(self): return self._value
+
+    def set(self, value):
+        if value == self._value: return
+        self._value = value
+        for binding in self._bindings: binding.mark_dirty()
+
+    value = property(get, set)
+
+class Binding:
+    """Apply 'transform(observable value)' to a widget with 'apply'.
+
+    Made by Bindings.bind_text, bind_colour and bind_visible.
+    """
+    def __init__(self, bindings, observable, apply, transform):
+        self.bindings = bindings
+        self.observable = observable
+        self.apply = apply
+        self.transform = transform
+        self.applied = _never # last value given to 'apply'
+
+    def mark_dirty(self): self.bindings._mark(self)
+
+    def flush(self): # -> bool
+        """Apply the current value unless the widget already shows it."""
+        value = self.transform(self.observable.get())
+        if value == self.applied: return False
+        self.apply(value)
+        self.applied = value
+        return True
+
+    def unbind(self):
+        self.observable._bindings.remove(self)
+        self.bindings._forget(self)
+
+_never = object() # not equal to any value: first flush always applies
+
+class Bindings:
+    """Dirty set of bindings, applied by 'flush()' once per frame.
+
+    Attributes
+    ----------
+    applied, skipped:
+        Counts of bindings applied and of identical values skipped.
+    """
+    def __init__(self):
+        self.applied = 0
+        self.skipped = 0
+        self._dirty = set()
+        self._lock = threading.Lock() # observables may be set from other threads
+
+    def bind(self, observable, apply, transform=None): # -> Binding
+        """Call apply(transform(value)) on flush when 'observable' changed."""
+        binding = Binding(self, observable, apply, transform or (lambda value: value))
+        observable._bindings.append(binding)
+        binding.mark_dirty() # show the current value at the next flush
+        return binding
+
+    def bind_text(self, observable, element, format='{}'): # -> Binding
+        """Show the value as the text of a UITextEntryLine or UITextBox.
+
+        'format' is a format string ('{:.1f} nm') or a function.
+        """
+        transform = format if callable(format) else format.format
+        return self.bind(observable, lambda text: _set_text(element, text), transform)
+
+    def bind_colour(self, observable, element, colour=None, attribute='text_colour'): # -> Binding
+        """Set the element's 'attribute' colour from the value.
+
+        'colour' maps the value to a colour (name, hex or RGB).
+        Default: the value is the colour.
+        """
+        return self.bind(observable, lambda value: _set_colour(element, attribute, value), colour)
+
+    def bind_visible(self, observable, element, visible=bool): # -> Binding
+        """Show the element when visible(value) is true, hide it otherwise."""
+        return self.bind(observable, lambda shown: _set_visible(element, shown), visible)
+
+    def flush(self): # -> int
+        """Apply dirty bindings. Return how many widgets changed."""
+        with self._lock: dirty, self._dirty = self._dirty, set()
+        changed = 0
+        for binding in dirty:
+            if binding.flush(): changed += 1
+            else: self.skipped += 1
+        self.applied += changed
+        return changed
+
+    def _mark(self, binding):
+        with self._lock: self._dirty.add(binding)
+
+    def _forget(self, binding):
+        with self._lock: self._dirty.discard(binding)
+
+def _set_text(element, text):
+    if hasattr(element, 'set_text'): element.set_text(text) # UITextEntryLine
+    else:
+        element.html_text = text # UITextBox
+        element.rebuild()
+
+def _set_colour(element, attribute, colour):
+    setattr(element, attribute, pygame.Color(colour))
+    if hasattr(element, 'redraw'): element.redraw() # UITextEntryLine
+    else: element.rebuild()
+
+def _set_visible(element, shown):
+    if shown: _pool.show_element(element)
+    else: _pool.hide_element(element)
+
+# ---Default bindings: flush once per frame---
+bindings = Bindings()
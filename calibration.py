@@ -0,0 +1,187 @@
+"""Pixel to wavelength calibration with precomputed lookup tables.
+
+A calibration polynomial maps detector pixel p to wavelength:
+    wavelength = c0 + c1*p + c2*p**2 + c3*p**3 + ...
+Calibration evaluates the polynomial once, for every pixel, and builds
+an inverse table on a uniform wavelength grid. After that, converting
+a whole sweep or a cursor position is a table read (plus a linear
+interpolation for positions between table entries).
+
+Calibrations are cached by ID, so every plot and readout using the
+same spectrometer shares one set of tables.
+
+Calibration file (JSON)
+-----------------------
+{
+    "usb4000": {"coefficients": [339.2, 0.2215, -1.38e-5, -1.2e-10], "n_pixels": 3648},
+    "qe-pro":  {"coefficients": [180.6, 0.8012, -3.1e-5], "n_pixels": 1044}
+}
+
+Example
+-------
+import makeuppy as mukpy
+mukpy.load_calibrations('calibration.json')
+cal = mukpy.get_calibration('usb4000')
+cal.wavelengths # nm of every pixel: the x axis of the plot
+cal.to_pixel(532.0) # cursor readout: pixel under 532 nm
+grid = cal.uniform_grid(step=0.5)
+spectrum = cal.resample(counts, grid) # counts on a uniform nm grid
+
+# From the command line, via the application's ':eval':
+#   :eval(pgui.wavelength_of('usb4000', 1024))
+# or with the ':cal' command:
+#   :cal usb4000 1024
+#   OK: pixel 1024 = 550.35 nm
+"""
+import json
+import numpy as np
+from . import makeuppy as _mukpy
+
+class Calibration:
+    """Forward (pixel -> nm) and inverse (nm -> pixel) lookup tables.
+
+    Behavior
+    --------
+    Integer pixels read the forward table directly
+    Fractional pixels and wavelengths interpolate linearly between
+    table entries
+    Wavelengths outside the detector range give NaN pixels
+    Raises ValueError if the polynomial is not monotonic over the
+    detector: then a wavelength has more than one pixel
+
+    Parameters
+    ----------
+    coefficients:
+        Polynomial coefficients c0, c1, c2, ... (lowest order first,
+        the order spectrometers report them in).
+    n_pixels:
+        type: int
+        Number of detector pixels.
+    inverse_oversample:
+        type: int
+        Inverse table entries per pixel. More is more accurate for
+        strongly curved calibrations.
+    """
+    def __init__(self, coefficients, n_pixels, inverse_oversample=4):
+        self.coefficients = tuple(float(c) for c in coefficients)
+        self.n_pixels = n_pixels
+        pixels = np.arange(n_pixels, dtype=float)
+        # Forward table: polynomial at every pixel
+        self.wavelengths = np.polynomial.polynomial.polyval(pixels, self.coefficients)
+        self.wavelengths.flags.writeable = False # shared by every user of the ID
+        steps = np.diff(self.wavelengths)
+        if not (np.all(steps > 0) or np.all(steps < 0)):
+            raise ValueError("calibration is not monotonic over the detector")
+        # Inverse table: pixel at uniformly spaced wavelengths
+        if steps[0] > 0: table, index = self.wavelengths, pixels
+        else: table, index = self.wavelengths[::-1], pixels[::-1]
+        self.min_wavelength, self.max_wavelength = table[0], table[-1]
+        size = inverse_oversample*n_pixels
+        self._inverse_step = (table[-1] - table[0])/(size - 1)
+        self._inverse = np.interp(
+            self.min_wavelength + self._inverse_step*np.arange(size),
+            table, index
+            )
+        self._grids = {} # {(start, step, size): pixel of each grid point}
+
+    def to_wavelength(self, pixels): # -> float or numpy.ndarray
+        """Return the wavelength of each pixel (int or fractional), NaN if off the detector."""
+        pixels = np.asarray(pixels)
+        if pixels.dtype.kind not in 'iu': return _lookup(self.wavelengths, pixels, 0.0, 1.0)
+        # Whole pixels: read the table, but not with negative (from the end) or past-the-end indexes
+        inside = (pixels >= 0) & (pixels < self.n_pixels)
+        value = np.where(inside, self.wavelengths[np.where(inside, pixels, 0)], np.nan)
+        return value if value.ndim else float(value)
+
+    def to_pixel(self, wavelengths): # -> float or numpy.ndarray
+        """Return the fractional pixel of each wavelength, NaN if off the detector."""
+        return _lookup(self._inverse, np.asarray(wavelengths, dtype=float),
+                       self.min_wavelength, self._inverse_step)
+
+    def uniform_grid(self, step=None, size=None): # -> numpy.ndarray
+        """Uniform wavelengths covering the detector, 'step' nm apart or 'size' points.
+
+        Default: as many points as pixels.
+        """
+        if step is not None:
+            return np.arange(self.min_wavelength, self.max_wavelength + step/2, step)
+        return np.linspace(self.min_wavelength, self.max_wavelength, size or self.n_pixels)
+
+    def resample(self, counts, grid): # -> numpy.ndarray
+        """Interpolate 'counts' (one value per pixel) onto the wavelengths 'grid'.
+
+        The pixel of each grid point is computed once per grid and
+        cached, so resampling every sweep is one interpolation.
+        Grid points off the detector are NaN.
+        """
+        grid = np.asarray(grid, dtype=float)
+        key = (grid[0], grid[-1], len(grid))
+        pixels = self._grids.get(key)
+        if pixels is None: pixels = self._grids[key] = self.to_pixel(grid)
+        return np.interp(pixels, np.arange(self.n_pixels), counts, left=np.nan, right=np.nan)
+
+def _lookup(table, x, start, step): # -> float or numpy.ndarray
+    """Linear interpolation in 'table' sampled every 'step' from 'start'. NaN outside."""
+    position = (x - start)/step
+    last = len(table) - 1
+    inside = (position >= 0) & (position <= last)
+    position = np.where(inside, position, 0)
+    left = np.minimum(position.astype(np.intp), last - 1)
+    fraction = position - left
+    value = table[left]*(1 - fraction) + table[left + 1]*fraction
+    value = np.where(inside, value, np.nan)
+    return value if value.ndim else float(value)
+
+def add_calibration(cal_id, coefficients, n_pixels): # -> Calibration
+    """Build the tables for 'cal_id' and cache them.
+
+    Adding the same coefficients again returns the cached Calibration.
+    """
+    calibration = _calibrations.get(cal_id)
+    coefficients = tuple(float(c) for c in coefficients)
+    if (calibration is None
+            or calibration.coefficients != coefficients
+            or calibration.n_pixels != n_pixels):
+        calibration = _calibrations[cal_id] = Calibration(coefficients, n_pixels)
+    return calibration
+
+def load_calibrations(path): # -> list
+    """Add every calibration in JSON file 'path'. Return their IDs."""
+    with open(path) as file: entries = json.load(file)
+    for cal_id, entry in entries.items():
+        add_calibration(cal_id, entry['coefficients'], entry['n_pixels'])
+    return list(entries)
+
+def get_calibration(cal_id): # -> Calibration
+    """Return the cached Calibration for 'cal_id'."""
+    try: return _calibrations[cal_id]
+    except KeyError: raise KeyError(f"no calibration '{cal_id}'") from None
+
+def wavelength_of(cal_id, pixels): return get_calibration(cal_id).to_wavelength(pixels)
+def pixel_of(cal_id, wavelengths): return get_calibration(cal_id).to_pixel(wavelengths)
+
+_calibrations = {} # {cal_id: Calibration}
+
+def _cal(args):
+    """:cal [id [pixel | wavelength nm]]"""
+    words = args.split()
+    if not words:
+        if not _calibrations: return "OK: no calibrations loaded"
+        return "OK: " + ", ".join(
+            f"{cal_id} ({cal.min_wavelength:.1f}-{cal.max_wavelength:.1f} nm)"
+            for cal_id, cal in _calibrations.items()
+            )
+    calibration = get_calibration(words[0])
+    if len(words) == 1:
+        return f"OK: {words[0]}: {calibration.n_pixels} pixels, coefficients {list(calibration.coefficients)}"
+    value = ' '.join(words[1:])
+    if value.endswith('nm'):
+        wavelength = float(value[:-2])
+        pixel = calibration.to_pixel(wavelength)
+        if np.isnan(pixel): return f"ERROR: {wavelength} nm is off the detector"
+        return f"OK: {wavelength} nm = pixel {pixel:.2f}"
+    wavelength = calibration.to_wavelength(float(value))
+    if np.isnan(wavelength): return f"ERROR: pixel {value} is off the detector"
+    return f"OK: pixel {value} = {wavelength:.2f} nm"
+
+_mukpy.register_command('cal', _cal, 'Calibrations: :cal [id [pixel | wavelength nm]]')
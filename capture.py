@@ -0,0 +1,224 @@
+"""Record the GUI to disk: ':rec start', ':rec stop' or F12.
+
+Frames are copied out of the display surface into a small pool of
+preallocated NumPy buffers. A background writer thread encodes the
+buffers as a PNG sequence or as raw '.npy' frame dumps.
+
+The application calls 'capture_frame(display)' once per frame, after
+drawing and before 'pygame.display.update()'. Nothing happens unless
+a recording is running.
+
+Example
+-------
+import makeuppy as mukpy
+display = mukpy.make_window()
+while not quit:
+    for event in pygame.event.get():
+        key_pressed = pygame.key.get_pressed()
+        if mukpy.user_toggles_recording(key_pressed):
+            cmdoutput.set_text(mukpy.toggle_recording())
+    # ...draw...
+    mukpy.capture_frame(display)
+    pygame.display.update()
+"""
+import pygame
+import numpy as np
+import threading # writer thread encodes frames off the UI thread
+import queue # bounded hand-off between UI thread and writer thread
+import os
+import time
+from collections import namedtuple
+from . import makeuppy as _mukpy
+
+class FrameRecorder:
+    """Copy frames from a Surface and write them from a background thread.
+
+    Behavior
+    --------
+    capture() does nothing if the recorder is not started
+    capture() never blocks: if every buffer is still waiting to be
+    written, the frame is dropped and 'dropped' counts it
+    stop() waits for the writer thread to finish pending frames
+
+    Parameters
+    ----------
+    out_dir:
+        type: str
+        Each recording goes in a new time-stamped folder in 'out_dir'.
+    fmt:
+        'png': one PNG file per frame
+        'raw': one '.npy' file per frame, array shape (rows, cols, 3)
+        Use 'raw' for high frame rates. Encoding PNG is slow.
+    max_pending:
+        type: int
+        Number of frame buffers. This is the most frames that can
+        wait for the writer thread before frames are dropped.
+    """
+    formats = ('png', 'raw')
+
+    def __init__(self, out_dir='capture', fmt='png', max_pending=8):
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.max_pending = max_pending
+        self.recording = False
+        self.path = None
+        self.captured = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.error = None # last error of the writer thread, e.g. disk full
+        self._pending = None
+        self._writer = None
+        self._layout = None
+        self._free = None
+        self._allocated = 0
+
+    def start(self, out_dir=None, fmt=None):
+        """Start a new recording. Return the folder frames are saved in."""
+        if self.recording: return self.path
+        if out_dir is not None: self.out_dir = out_dir
+        if fmt is not None: self.fmt = fmt
+        if self.fmt not in self.formats:
+            raise ValueError(f"fmt must be one of {self.formats}, not '{self.fmt}'")
+        self.path = os.path.join(self.out_dir, time.strftime('%Y%m%d-%H%M%S'))
+        os.makedirs(self.path, exist_ok=True)
+        self.captured = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.error = None
+        self._layout = None # buffers are allocated on the first frame
+        # Queue never fills: there are only 'max_pending' buffers.
+        self._pending = queue.Queue(maxsize=self.max_pending)
+        self._writer = threading.Thread(
+            target=self._write_frames,
+            args=(self._pending, self.path, self.fmt),
+            daemon=True
+            )
+        self._writer.start()
+        self.recording = True
+        return self.path
+
+    def stop(self):
+        """Stop recording. Return after all pending frames are written."""
+        if not self.recording: return self.path
+        self.recording = False
+        while self._writer.is_alive():
+            # Tell writer thread to finish. Never block on a full queue
+            # if the writer thread died.
+            try: self._pending.put(None, timeout=0.1); break
+            except queue.Full: pass
+        self._writer.join()
+        return self.path
+
+    def capture(self, surface):
+        """Copy 'surface' pixels into a free buffer and queue it for writing.
+
+        'surface' must be 32 bits per pixel. The display surface
+        returned by 'make_window' and 'make_screensize' is.
+        """
+        if not self.recording: return
+        layout = _surface_layout(surface)
+        if layout != self._layout: self._new_buffer_pool(layout)
+        try: buf = self._free.get_nowait()
+        except queue.Empty:
+            if self._allocated == self.max_pending:
+                self.dropped += 1
+                return
+            buf = np.empty(layout.pitch*layout.rows, dtype=np.uint8)
+            self._allocated += 1
+        # One memcpy straight out of the pixel buffer, no Surface.copy()
+        np.copyto(buf, np.frombuffer(surface.get_buffer(), dtype=np.uint8))
+        self.captured += 1
+        try: self._pending.put_nowait((self.captured, buf, layout, self._free))
+        except queue.Full:
+            self._free.put(buf)
+            self.dropped += 1
+
+    def status(self): # -> str
+        """Return a one-line summary of the recording.
+
+        Dropped frames are only reported in dev mode. Frames that
+        could not be written are always reported.
+        """
+        state = 'recording' if self.recording else 'stopped'
+        summary = f"{state}, {self.written} frames saved to {self.path}"
+        if _mukpy.get_dev_mode(): summary += f" ({self.dropped} dropped)"
+        if self.failed: summary += f", {self.failed} frames not written: {self.error}"
+        return summary
+
+    def _new_buffer_pool(self, layout):
+        """Window changed size: buffers in flight return to the old pool."""
+        if layout.bytesize != 4:
+            raise ValueError(f"Can only record 32-bit surfaces, not {8*layout.bytesize}-bit")
+        self._layout = layout
+        self._free = queue.Queue()
+        self._allocated = 0
+
+    def _write_frames(self, pending, path, fmt):
+        """Writer thread: encode frames until 'stop()' queues None."""
+        while True:
+            item = pending.get()
+            if item is None: break
+            index, buf, layout, free = item
+            try:
+                _write_frame(buf, layout, os.path.join(path, f'frame_{index:06d}'), fmt)
+                self.written += 1
+            except Exception as error: # e.g. disk full: keep draining so capture and stop never block
+                self.failed += 1
+                self.error = error
+            finally: free.put(buf) # buffer is reusable
+
+_Layout = namedtuple(
+    'Layout', [ 'cols', 'rows', 'pitch', 'bytesize', 'rgb_bytes' ])
+
+def _surface_layout(surface): # -> Layout
+    """Describe the pixel memory so the writer thread can decode it."""
+    cols, rows = surface.get_size()
+    # Byte offset of R, G, B in each pixel (pixels are little-endian)
+    rgb_bytes = tuple(shift//8 for shift in surface.get_shifts()[:3])
+    return _Layout(cols, rows, surface.get_pitch(), surface.get_bytesize(), rgb_bytes)
+
+def _write_frame(buf, layout, filename, fmt):
+    pixels = buf.reshape(layout.rows, layout.pitch)[:, :4*layout.cols]
+    rgb = pixels.reshape(layout.rows, layout.cols, 4)[..., list(layout.rgb_bytes)]
+    if fmt == 'raw':
+        np.save(f'{filename}.npy', rgb)
+    else:
+        image = pygame.image.frombuffer(rgb.tobytes(), (layout.cols, layout.rows), 'RGB')
+        pygame.image.save(image, f'{filename}.png')
+
+# ---Default recorder used by ':rec' and F12---
+frame_recorder = FrameRecorder()
+
+def capture_frame(surface):
+    """Record 'surface' if a recording is running. Call once per frame."""
+    frame_recorder.capture(surface)
+
+def toggle_recording(): # -> str
+    """Start or stop the default recorder. Return a response for 'cmdoutput'."""
+    return _rec('stop' if frame_recorder.recording else 'start')
+
+def _rec(args):
+    """
+    :rec
+        Show recording status.
+    :rec start [folder] [png|raw]
+        Start recording frames passed to 'capture_frame'.
+    :rec stop
+        Stop recording. Waits for pending frames to be written.
+    """
+    words = args.split()
+    if len(words) == 0: return f"OK: {frame_recorder.status()}"
+    if words[0] == 'start':
+        out_dir = None; fmt = None
+        for word in words[1:]:
+            if word in FrameRecorder.formats: fmt = word
+            else: out_dir = word
+        return f"OK: recording to {frame_recorder.start(out_dir, fmt)}"
+    if words[0] == 'stop':
+        frame_recorder.stop()
+        return f"OK: {frame_recorder.status()}"
+    return f"ERROR: expected ':rec start' or ':rec stop', got ':rec {args}'"
+
+_mukpy.register_command('rec', _rec, 'Record frames to disk: :rec start|stop')
@@ -0,0 +1,201 @@
+"""Input latency from the event being pumped to the frame that shows it.
+
+Frame times say how fast the GUI draws, not how long a keypress takes
+to show up. The LatencyTracer stamps each keyboard and mouse event as
+the application takes it from the queue ('pygame.event.get', 'poll'
+or 'wait'), notes when it passes the stages on the way
+('user_opens_cmdline', 'evaluate', UIManager update), and stops the
+clock at the next 'pygame.display.flip' or 'update' (or
+'AppWindow.present'): the first frame that can show its effect.
+
+Time the event spent in the queue before the application pumped it
+is included only from the pump on: pygame does not expose SDL's
+event timestamps.
+
+COLON commands (dev mode)
+-------------------------
+:latency start
+    Start tracing. Wraps the pygame functions listed above.
+:latency
+    p50 and p99 latency per input type, e.g.
+    OK: key p50 9.8 ms p99 24.1 ms (n=212) | click p50 ...
+:latency dump [path]
+    Write every traced input, with its stage times, as JSON
+    (default 'latency.json').
+:latency stop
+    Stop tracing and put the pygame functions back.
+
+Example
+-------
+import makeuppy as mukpy
+mukpy.latency_tracer.start()
+# ...operators use the GUI...
+print(mukpy.latency_tracer.report()) # {'key': {'n': 212, 'p50_ms': 9.8, ...}, ...}
+mukpy.latency_tracer.dump('latency.json')
+"""
+import json
+import time
+from collections import deque
+import numpy as np
+import pygame
+import pygame_gui
+from . import makeuppy as _mukpy
+from .spatial import IndexedUIManager as _IndexedUIManager
+from .windows import AppWindow as _AppWindow
+
+_kinds = {
+    pygame.KEYDOWN: 'key',
+    pygame.TEXTINPUT: 'text',
+    pygame.MOUSEBUTTONDOWN: 'click',
+    pygame.MOUSEWHEEL: 'wheel',
+    pygame.MOUSEMOTION: 'motion',
+    }
+
+class LatencyTracer:
+    """Time keyboard and mouse events from pump to present.
+
+    Behavior
+    --------
+    Each traced event records the time of the first pass through
+    each stage after it was pumped
+    All events pending at a present complete there
+    Only the last 'max_samples' inputs are kept
+    start() twice does nothing; stop() puts pygame back as it was
+
+    Parameters
+    ----------
+    clock:
+        Function returning the time in seconds.
+    max_samples:
+        Inputs kept for the report and the dump.
+    """
+    def __init__(self, clock=time.perf_counter, max_samples=10000):
+        self.clock = clock
+        self.samples = deque(maxlen=max_samples) # {'kind', 'latency', 'stages'}
+        self.started = False
+        self._pending = [] # [(kind, pumped, {stage: time})]
+        self._originals = []
+
+    def start(self):
+        """Wrap pygame and makeuppy so inputs are stamped on their way."""
+        if self.started: return
+        self.started = True
+        tracer = self
+        def pumped(get):
+            def traced(*args, **kwargs):
+                events = get(*args, **kwargs)
+                tracer.pumped(events if isinstance(events, list) else [events])
+                return events
+            return traced
+        def presented(show):
+            def traced(*args, **kwargs):
+                result = show(*args, **kwargs)
+                tracer.presented()
+                return result
+            return traced
+        def stage(update, name):
+            def traced(*args, **kwargs):
+                result = update(*args, **kwargs)
+                tracer.mark(name)
+                return result
+            return traced
+        self._patch(pygame.event, 'get', pumped)
+        self._patch(pygame.event, 'poll', pumped)
+        self._patch(pygame.event, 'wait', pumped)
+        self._patch(pygame.display, 'flip', presented)
+        self._patch(pygame.display, 'update', presented)
+        self._patch(_AppWindow, 'present', presented)
+        for manager_type in (pygame_gui.UIManager, _IndexedUIManager):
+            self._patch(manager_type, 'update', lambda update: stage(update, 'ui_update'))
+        self._patch(_mukpy, '_trace', lambda trace: self.mark)
+
+    def stop(self):
+        """Put the wrapped functions back. Pending inputs are dropped."""
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+        self._pending = []
+        self.started = False
+
+    def reset(self):
+        self.samples.clear()
+        self._pending = []
+
+    def pumped(self, events):
+        """Stamp keyboard and mouse 'events' just taken from the queue."""
+        now = None
+        for event in events:
+            kind = _kinds.get(event.type)
+            if kind is None: continue
+            if now is None: now = self.clock()
+            self._pending.append((kind, now, {}))
+
+    def mark(self, stage):
+        """Note that pending inputs reached 'stage'."""
+        if not self._pending: return
+        now = self.clock()
+        for kind, pumped, stages in self._pending: stages.setdefault(stage, now)
+
+    def presented(self):
+        """A frame was shown: pending inputs are done."""
+        if not self._pending: return
+        now = self.clock()
+        for kind, pumped, stages in self._pending:
+            self.samples.append({
+                'kind': kind,
+                'latency': now - pumped,
+                'stages': {name: at - pumped for name, at in stages.items()},
+                })
+        self._pending = []
+
+    def report(self): # -> dict
+        """{kind: {'n', 'p50_ms', 'p99_ms', 'max_ms'}} over kept inputs."""
+        latencies = {}
+        for sample in self.samples: latencies.setdefault(sample['kind'], []).append(sample['latency'])
+        report = {}
+        for kind, values in latencies.items():
+            p50, p99 = 1000*np.percentile(values, [50, 99])
+            report[kind] = {'n': len(values), 'p50_ms': p50, 'p99_ms': p99,
+                            'max_ms': 1000*max(values)}
+        return report
+
+    def dump(self, path='latency.json'):
+        """Write the report and every kept input as JSON."""
+        with open(path, 'w') as file:
+            json.dump({'report': self.report(), 'samples': list(self.samples)}, file, indent=1)
+
+    def _patch(self, owner, name, wrap):
+        original = getattr(owner, name)
+        self._originals.append((owner, name, original))
+        setattr(owner, name, wrap(original))
+
+# ---Default tracer for ':latency'---
+latency_tracer = LatencyTracer()
+
+def _latency(args):
+    """:latency [start|stop|dump [path]|reset]"""
+    if not _mukpy.get_dev_mode(): return "ERROR: ':latency' needs dev mode"
+    words = args.split()
+    if words == ['start']:
+        latency_tracer.start()
+        return "OK: tracing input latency"
+    if words == ['stop']:
+        latency_tracer.stop()
+        return "OK: stopped tracing input latency"
+    if words == ['reset']:
+        latency_tracer.reset()
+        return "OK: latency samples cleared"
+    if words[:1] == ['dump'] and len(words) <= 2:
+        path = words[1] if len(words) == 2 else 'latency.json'
+        latency_tracer.dump(path)
+        return f"OK: {len(latency_tracer.samples)} inputs written to {path}"
+    if words: return f"ERROR: expected ':latency start|stop|dump|reset', got ':latency {args}'"
+    report = latency_tracer.report()
+    if not report:
+        return "OK: no inputs traced" + ("" if latency_tracer.started else ", ':latency start' first")
+    return "OK: " + ' | '.join(
+        f"{kind} p50 {stats['p50_ms']:.1f} ms p99 {stats['p99_ms']:.1f} ms (n={stats['n']})"
+        for kind, stats in sorted(report.items())
+        )
+
+_mukpy.register_command('latency', _latency, 'Input-to-present latency (dev mode): :latency [start|stop|dump [path]|reset]')
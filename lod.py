@@ -0,0 +1,223 @@
+"""Min/max level-of-detail pyramid for plotting very long recordings.
+
+Level 1 holds the min and max of every 'factor' samples, level 2 the
+min and max of every 'factor' level-1 blocks, and so on up to a single
+block. Plotting a window of the data reads only the level whose block
+size matches the plot width in pixels, so drawing a window over 10^9
+samples costs the same as drawing one over 10^3.
+
+The pyramid is built incrementally: 'update(data)' only visits the
+samples added since the last update. Save it next to the recording and
+open it again with mmap in later sessions.
+
+Example
+-------
+import makeuppy as mukpy
+run1 = mukpy.open_recording('run1.npy')
+pyramid = mukpy.MinMaxPyramid.open('run1.npy') # empty if never saved
+pyramid.update(run1.counts) # only new sweeps are visited
+pyramid.save('run1.npy')
+viewer = mukpy.LodViewer(pyramid, run1.counts, pygame.Rect(0,0,600,400), channel=512)
+# ...in the event loop...
+viewer.zoom(0.5) # zoom in 2x about the middle
+viewer.pan(0.1) # scroll right by a tenth of the window
+viewer.draw(display)
+"""
+import pygame
+import numpy as np
+import os
+from . import makeuppy as _mukpy
+
+class MinMaxPyramid:
+    """Min/max of 'data' along axis 0 at block sizes factor, factor**2, ...
+
+    Behavior
+    --------
+    update(data) visits only samples added since the last update
+    view(data, start, stop, width) reads at most width*factor blocks
+    Works for 1D data (samples) and 2D data (sweeps x pixels): for 2D
+    data each pixel column gets its own min and max.
+
+    Parameters
+    ----------
+    factor:
+        type: int
+        Number of blocks in one level that make a block in the next.
+    levels:
+        list of arrays, shape (blocks, 2, ...) where [:,0] is min and
+        [:,1] is max. Use 'MinMaxPyramid.open()' instead of passing
+        levels.
+    """
+    def __init__(self, factor=4, levels=None):
+        if factor < 2: raise ValueError(f"factor must be 2 or more, not {factor}")
+        self.factor = factor
+        self.levels = list(levels) if levels is not None else []
+        # Last block of level 1 may have been partial: visit it again.
+        self.count = max(0, len(self.levels[0]) - 1)*factor if self.levels else 0
+        self._buffers = list(self.levels) # growable storage behind each level
+
+    def block_size(self, level): return self.factor**level
+
+    def update(self, data):
+        """Add the min and max of samples data[self.count:] to every level."""
+        n_samples = len(data)
+        if n_samples <= self.count: return
+        start, stop = self.count, n_samples
+        source_min = source_max = data # level 0 is the data itself
+        level = 0
+        while stop > 1 or level == 0:
+            first = start//self.factor
+            blocks = -(-stop//self.factor) # ceil
+            offsets = np.arange(0, stop - first*self.factor, self.factor)
+            mins = np.minimum.reduceat(np.asarray(source_min[first*self.factor:stop]), offsets, axis=0)
+            maxs = np.maximum.reduceat(np.asarray(source_max[first*self.factor:stop]), offsets, axis=0)
+            table = self._resize(level, blocks, mins)
+            table[first:blocks, 0] = mins
+            table[first:blocks, 1] = maxs
+            source_min, source_max = table[:, 0], table[:, 1]
+            start, stop = first, blocks
+            level += 1
+        self.count = n_samples
+
+    def view(self, data, start, stop, width): # -> (x, mins, maxs)
+        """Return min and max of data[start:stop] at a resolution that fits 'width'.
+
+        Returns about 'width' to 'width*factor' points.
+        'x' is the index of the first sample in each point.
+        """
+        start = max(0, int(start)); stop = min(int(stop), max(len(data), self.count))
+        level = 0
+        while (level < len(self.levels)
+               and self.block_size(level+1)*width <= stop - start):
+            level += 1
+        if level == 0:
+            samples = np.asarray(data[start:stop])
+            return np.arange(start, stop), samples, samples
+        block = self.block_size(level)
+        first = start//block; last = -(-stop//block)
+        table = self.levels[level-1]
+        return np.arange(first, last)*block, table[first:last, 0], table[first:last, 1]
+
+    def save(self, path):
+        """Save each level next to the recording 'path'."""
+        for level, table in enumerate(self.levels, start=1):
+            np.save(lod_path(path, level), table)
+        # Remove stale levels left over from a differently sized save
+        level = len(self.levels) + 1
+        while os.path.exists(lod_path(path, level)):
+            os.remove(lod_path(path, level))
+            level += 1
+
+    @classmethod
+    def open(cls, path, factor=4): # -> MinMaxPyramid
+        """Return the pyramid saved next to 'path', memory-mapped.
+
+        Returns an empty pyramid if none was saved. 'factor' must be
+        the factor the pyramid was saved with.
+        """
+        levels = []
+        while os.path.exists(lod_path(path, len(levels)+1)):
+            levels.append(np.load(lod_path(path, len(levels)+1), mmap_mode='r'))
+        for lower, upper in zip(levels, levels[1:]):
+            if len(upper) != -(-len(lower)//factor):
+                raise ValueError(f"Pyramid next to {path} was not saved with factor={factor}")
+        return cls(factor, levels)
+
+    def _resize(self, level, blocks, like): # -> array
+        """Return level table with room for 'blocks' rows, growing by doubling."""
+        if level == len(self.levels):
+            self._buffers.append(np.empty((0, 2) + like.shape[1:], like.dtype))
+            self.levels.append(self._buffers[level])
+        buffer = self._buffers[level]
+        if blocks > len(buffer) or not buffer.flags.writeable:
+            grown = np.empty((max(blocks, 2*len(buffer)),) + buffer.shape[1:], buffer.dtype)
+            grown[:len(self.levels[level])] = self.levels[level]
+            self._buffers[level] = buffer = grown
+        self.levels[level] = buffer[:blocks]
+        return self.levels[level]
+
+def lod_path(path, level): # -> str
+    """Return the name of the file for pyramid 'level' of recording 'path'."""
+    stem, ext = os.path.splitext(path)
+    return f'{stem}-lod{level}{ext or ".npy"}'
+
+class LodViewer:
+    """Draw a min/max envelope of a window of 'data' into 'rect'.
+
+    Each pixel column is a vertical line from the min to the max of
+    the samples under it. Pan and zoom change the window; the cost of
+    'draw' depends on the width of 'rect', not the length of 'data'.
+
+    Parameters
+    ----------
+    pyramid:
+        MinMaxPyramid of 'data'. Call 'pyramid.update(data)' as data
+        arrives.
+    data:
+        1D samples, or 2D sweeps with 'channel' selecting the column.
+    rect:
+        pygame.Rect to draw in.
+    channel:
+        Column of 2D data to plot. Ignored for 1D data.
+    ylim:
+        (low, high) or None to fit the window.
+    colour:
+        Line colour, default badwolf 'tardis'.
+    """
+    def __init__(self, pyramid, data, rect, channel=None, ylim=None, colour=None):
+        self.pyramid = pyramid
+        self.data = data
+        self.rect = pygame.Rect(rect)
+        self.channel = channel
+        self.ylim = ylim
+        self.colour = colour if colour is not None else _mukpy.ColorRGB().tardis
+        self.start = 0
+        self.stop = max(len(data), 1)
+
+    def pan(self, fraction):
+        """Scroll by 'fraction' of the window width. Positive is right."""
+        span = self.stop - self.start
+        shift = int(round(fraction*span))
+        shift = min(max(shift, -self.start), max(len(self.data) - self.stop, 0))
+        self.start += shift; self.stop += shift
+
+    def zoom(self, scale, about=0.5):
+        """Scale window width by 'scale' (< 1 zooms in) about a fraction of the window."""
+        span = self.stop - self.start
+        centre = self.start + about*span
+        new_span = min(max(int(span*scale), 2), max(len(self.data), 2))
+        self.start = max(0, int(centre - about*new_span))
+        self.stop = self.start + new_span
+        if self.stop > len(self.data):
+            self.stop = max(len(self.data), 2)
+            self.start = max(0, self.stop - new_span)
+
+    def columns(self): # -> (col, mins, maxs)
+        """Return the min and max under each pixel column of 'rect'.
+
+        'col' is the pixel column, counted from the left of 'rect'.
+        Columns with no samples under them are left out.
+        """
+        width = self.rect.width
+        x, mins, maxs = self.pyramid.view(self.data, self.start, self.stop, width)
+        if mins.ndim > 1:
+            mins = mins[:, self.channel]; maxs = maxs[:, self.channel]
+        if len(x) == 0: return x, mins, maxs
+        # Bin points into pixel columns
+        span = max(self.stop - self.start, 1)
+        col = np.clip((x - self.start)*width//span, 0, width-1)
+        first = np.flatnonzero(np.r_[True, col[1:] != col[:-1]])
+        return col[first], np.minimum.reduceat(mins, first), np.maximum.reduceat(maxs, first)
+
+    def draw(self, surface):
+        """Draw the window of data into 'rect' on 'surface'."""
+        col, mins, maxs = self.columns()
+        if len(col) == 0: return
+        low, high = self.ylim if self.ylim is not None else (mins.min(), maxs.max())
+        scale = (self.rect.height - 1)/(high - low) if high > low else 0
+        bottom = self.rect.bottom - 1
+        y_min = bottom - ((mins - low)*scale).astype(int)
+        y_max = bottom - ((maxs - low)*scale).astype(int)
+        x = self.rect.left + col
+        for xi, y0, y1 in zip(x.tolist(), y_min.tolist(), y_max.tolist()):
+            pygame.draw.line(surface, self.colour, (xi, y0), (xi, y1))
@@ -2,13 +2,98 @@ import pygame
 import pygame_gui
 from collections import namedtuple # assumes Python 3.8
 import sys # catch and return eval errors as string instead of halting
+import re # parse COLON command names
 import os # get path to this package
+import importlib # import command modules on first use
+import json # read command manifest
+import threading # import command modules in the background
+import weakref # track UIManagers without keeping them alive
+import contextlib # use_app() with block
+import contextvars # current App per thread and asyncio task
+import types # module class with DEV and CMD properties
+from .textcache import TextCache, use_text_cache
+from .textcache import text_cache as _shared_text_cache
+from .spatial import IndexedUIManager
 
 # USEREVENTS defined by pygameapi
 UI_CMD = 0
 
-DEV = False
-def get_dev_mode(): return DEV
+class App:
+    """Application state: mode flags, display, UI managers and caches.
+
+    Module functions ('set_dev_mode', 'user_quit', 'new_ui_manager',
+    ...) work on the current App. That is 'default_app' unless the
+    application makes its own App and uses it with 'use_app'.
+
+    Behavior
+    --------
+    Each App has its own mode flags, UI managers and text cache
+    Changing one App does not change another App
+    'with use_app(app):' makes 'app' current until the block ends,
+    in this thread (or asyncio task) only
+    A new thread starts with 'default_app' current
+
+    Parameters
+    ----------
+    dev:
+        type: bool
+        Start in dev mode. See 'set_dev_mode'.
+    cmd:
+        type: bool
+        Start in command mode. See 'set_cmd_mode'.
+    text_cache:
+        TextCache for text of the App's UI managers.
+        Default: a new TextCache ('default_app' uses the shared
+        'text_cache').
+
+    Example
+    -------
+    # Many headless GUIs in one process, one per thread
+    def run_gui(name):
+        with makeuppy.use_app(makeuppy.App(dev=True)) as app:
+            gui = makeuppy.Offscreen(cols=320, rows=240)
+            # ...build UI, evaluate commands, gui.render()...
+            return app.text_cache.stats()
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+        results = list(pool.map(run_gui, range(8)))
+    """
+    def __init__(self, dev=False, cmd=False, text_cache=None):
+        self.dev = dev
+        self.cmd = cmd
+        self.display = None # Surface to draw on: window or offscreen
+        self.ui_managers = weakref.WeakSet() # forget managers the application drops
+        self.text_cache = text_cache if text_cache is not None else TextCache()
+
+def current_app(): # -> App
+    """Return the App that module functions use in this thread."""
+    return _current_app.get()
+
+@contextlib.contextmanager
+def use_app(app):
+    """Make 'app' the current App inside a with block. Yields 'app'."""
+    token = _current_app.set(app)
+    try: yield app
+    finally: _current_app.reset(token)
+
+default_app = App(text_cache=_shared_text_cache)
+_current_app = contextvars.ContextVar('makeuppy_app', default=default_app)
+
+class _AppModule(types.ModuleType):
+    """Module whose DEV and CMD read and write the current App.
+
+    DEV and CMD used to be module globals. 'mukpy.DEV = True' still
+    works: it is the same as 'set_dev_mode(True)'.
+    """
+    DEV = property(
+        lambda module: current_app().dev,
+        lambda module, onoff_flag: setattr(current_app(), 'dev', onoff_flag))
+    CMD = property(
+        lambda module: current_app().cmd,
+        lambda module, onoff_flag: setattr(current_app(), 'cmd', onoff_flag))
+
+sys.modules[__name__].__class__ = _AppModule
+
+def get_dev_mode(): return current_app().dev
 def set_dev_mode(onoff_flag=True):
     """Enable development mode functionality.
 
@@ -18,6 +103,7 @@ def set_dev_mode(onoff_flag=True):
     pgui.DEV is False if set_dev_mode is not called
     pgui.DEV is True if set_dev_mode is called with True
     pgui.DEV is True if set_dev_mode is called with no argument
+    Only the current App changes (see 'App')
 
     Examples
     --------
@@ -38,14 +124,11 @@ def set_dev_mode(onoff_flag=True):
     pgui.set_dev_mode(False)    # Turn off dev mode
 
     """
-    global DEV
-    DEV = onoff_flag
+    current_app().dev = onoff_flag
 
-CMD = False
-def get_cmd_mode(): return CMD
+def get_cmd_mode(): return current_app().cmd
 def set_cmd_mode(onoff_flag=True):
-    global CMD
-    CMD = onoff_flag
+    current_app().cmd = onoff_flag
 
 Window = namedtuple('Window', [ 'cols', 'rows' ])
 
@@ -109,7 +192,8 @@ def make_window(cols=640, rows=480):
     Do not call this command on its own in the REPL.
     Instead, run the example script.
     '''
-    return pygame.display.set_mode(size=(cols,rows))
+    current_app().display = pygame.display.set_mode(size=(cols,rows))
+    return current_app().display
 
 
 def make_screensize(size=(640, 480), is_fullscreen=False): # -> Surface
@@ -166,8 +250,27 @@ def make_screensize(size=(640, 480), is_fullscreen=False): # -> Surface
             size # -> (width, height)
             )
         set_icon() # not visible if fullscreen
+    current_app().display = gui_display
     return gui_display
 
+def make_offscreen(cols=640, rows=480): # -> Surface
+    """Return a plain 32-bit Surface to draw the GUI on instead of a window.
+
+    No window appears. Use this on a headless machine (servers,
+    CI) or to render many GUIs in one process. See 'Offscreen'.
+
+    pygame_gui reads the mouse every update, which needs the video
+    system. If there is no display, the SDL 'dummy' video driver is
+    used. No window is made either way.
+    """
+    if not pygame.display.get_init():
+        try: pygame.display.init()
+        except pygame.error:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            pygame.display.init()
+    if not pygame.font.get_init(): pygame.font.init()
+    return pygame.Surface((cols, rows), depth=32)
+
 _pygameapi_path = os.path.dirname(__file__)
 _costume_path = os.path.join(_pygameapi_path, 'costume')
 # ROOT_PATH = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
@@ -179,12 +282,83 @@ def set_icon(icon=f'{_costume_path}/mike-icon.jpg'):
     """
     pygame.display.set_icon(pygame.image.load(icon))
 
-def new_ui_manager(gui_win, theme=f'{_costume_path}/theme.json'):
+def new_ui_manager(gui_win, theme=f'{_costume_path}/theme.json', indexed=False):
     """Return a new instance of the pygame_gui UIManager.
 
     I made this wrapper to set my default theme.json.
+
+    indexed=True returns an IndexedUIManager: hover and click
+    lookups use a spatial index of the elements. Use it for
+    dashboards with hundreds of elements.
+
+    The manager belongs to the current App. Text rendered by its
+    elements goes through the App's 'text_cache'.
+    """
+    app = current_app()
+    if indexed: manager = IndexedUIManager(window_size(gui_win), theme)
+    else: manager = pygame_gui.UIManager(window_size(gui_win), theme)
+    use_text_cache(manager, app.text_cache) # reuse rendered text across elements and frames
+    app.ui_managers.add(manager)
+    return manager
+
+def get_ui_managers(): # -> list
+    """Return the live UIManagers made by 'new_ui_manager' in the current App.
+
+    Managers of elements counted by ':stats ui' are added too.
     """
-    return pygame_gui.UIManager(window_size(gui_win), theme)
+    return list(current_app().ui_managers)
+
+class Offscreen:
+    """A GUI with no window: UIManager drawing on an offscreen Surface.
+
+    Build the same layouts as with a window by passing 'manager'
+    and 'window' to 'make_cmdline', 'make_textbox_fullheight_rightside',
+    etc. Then 'render()' draws the UI and returns the pixels.
+
+    Behavior
+    --------
+    render() returns a NumPy array view of the Surface pixels,
+    shape (rows, cols, 3), not a copy
+    The array locks the Surface: delete it before the next render()
+
+    Parameters
+    ----------
+    cols, rows:
+        type: int
+        Size of the offscreen Surface.
+    theme:
+        theme.json passed to 'new_ui_manager'.
+        None uses the pygame_gui default theme, which needs no
+        font files in the working folder.
+    background:
+        Fill colour drawn under the UI, default badwolf 'blackgravel'.
+
+    Example
+    -------
+    gui = makeuppy.Offscreen(cols=320, rows=240)
+    cmdline = makeuppy.make_cmdline(gui.manager, gui.window, stack_level=2)
+    cmdoutput = makeuppy.make_cmdline(gui.manager, gui.window, stack_level=1)
+    cmdoutput.set_text('OK: 3 instruments idle')
+    frame = gui.render()
+    thumbnail = frame[::4, ::4] # still a view
+    # ...save or compare...
+    del frame, thumbnail # unlock the Surface
+    """
+    def __init__(self, cols=640, rows=480, theme=f'{_costume_path}/theme.json', background=None):
+        self.window = Window(cols=cols, rows=rows)
+        self.surface = make_offscreen(cols, rows)
+        current_app().display = self.surface
+        self.manager = new_ui_manager(self.window, theme)
+        self.background = background if background is not None else ColorRGB().blackgravel
+
+    def render(self, time_delta=0.0): # -> numpy.ndarray
+        """Update and draw the UI. Return the pixels as a (rows, cols, 3) view."""
+        if self.surface.get_locked():
+            raise pygame.error("Delete the array from the last render() before rendering again")
+        self.manager.update(time_delta)
+        self.surface.fill(self.background)
+        self.manager.draw_ui(self.surface)
+        return pygame.surfarray.pixels3d(self.surface).swapaxes(0, 1)
 
 def get_rect_height_for_gapless_cmdline(manager): # -> Int
     """ Return rect height value in pixels so UITextEntryLine instances stack
@@ -233,25 +407,21 @@ def get_rect_height_for_gapless_cmdline(manager): # -> Int
     manager = makeuppy.new_ui_manager(fullscreen if is_fullscreen else windowed)
     cmdline_height = makeuppy.get_rect_height_for_gapless_cmdline(manager)
     """
-    dummy = pygame_gui.elements.ui_text_entry_line.UITextEntryLine(
-        relative_rect=pygame.Rect(
-            (0,0), # rect left,top
-            (50,0), # rect width,height (height set by font-size)
-            ),
-        manager=manager
-        )
+    # Font a UITextEntryLine gets from the theme. Ask the theme
+    # directly: making (and killing) a dummy element on every
+    # make_cmdline/resize_cmdline costs theme resolution and Surfaces.
+    font = manager.get_theme().get_font([None], ['text_entry_line'])
     # Find out the tallest character:
-    height = dummy.font.size('\n')[1] + 4
+    height = font.size('\n')[1] + 4
     '''
     Example heights
     ---------------
     Consolas 14 pt: 19 pixels tall
     Consolas 18 pt: 23 pixels tall
     '''
-    dummy.kill()
     return height
 
-def make_cmdline(manager, current_Window, stack_level): # -> UITextEntryLine
+def make_cmdline(manager, current_Window, stack_level, pool=None): # -> UITextEntryLine
     """Return UI element for a part of the command line.
 
     Parameters
@@ -272,6 +442,10 @@ def make_cmdline(manager, current_Window, stack_level): # -> UITextEntryLine
         stack_level=1: bottom line, e.g., the command output
         stack_level=2: next line up, e.g., the command input
 
+    pool:
+        ElementPool to reuse a released UITextEntryLine from.
+        Default: always make a new one.
+
     Returns an instance of UITextEntryLine.
 
     Appearance
@@ -313,45 +487,63 @@ def make_cmdline(manager, current_Window, stack_level): # -> UITextEntryLine
         software, and I'm not sure how to set the font without
         putting a copy of it in with this application.
     """
+    relative_rect = pygame.Rect(
+        (0,current_Window.rows-stack_level*get_rect_height_for_gapless_cmdline(manager)), # left,top is at bottom-left corner of window
+        (current_Window.cols,0), # width, height is at full-width, height set by font-size (input ignored)
+        )
+    if pool is not None:
+        return pool.acquire(pygame_gui.elements.ui_text_entry_line.UITextEntryLine, relative_rect)
     cmdline = pygame_gui.elements.ui_text_entry_line.UITextEntryLine(
-        relative_rect=pygame.Rect(
-            (0,current_Window.rows-stack_level*get_rect_height_for_gapless_cmdline(manager)), # left,top is at bottom-left corner of window
-            (current_Window.cols,0), # width, height is at full-width, height set by font-size (input ignored)
-            ),
+        relative_rect=relative_rect,
         manager=manager
         )
     return cmdline
-def make_textbox_fullheight_rightside(manager, current_Window, html_text, width):
+def make_textbox_fullheight_rightside(manager, current_Window, html_text, width, pool=None):
     cmdline_height = 2*get_rect_height_for_gapless_cmdline(manager)
+    relative_rect = pygame.Rect(
+        (current_Window.cols-width,0), # left,top is at top-right of window
+        (width,current_Window.rows-cmdline_height), # width, height
+        )
+    if pool is not None:
+        return pool.acquire(
+            pygame_gui.elements.ui_text_box.UITextBox, relative_rect,
+            html_text=html_text, wrap_to_height=False
+            )
     return pygame_gui.elements.ui_text_box.UITextBox(
         html_text=html_text,
-        relative_rect=pygame.Rect(
-            (current_Window.cols-width,0), # left,top is at top-right of window
-            (width,current_Window.rows-cmdline_height), # width, height
-            ),
+        relative_rect=relative_rect,
         manager=manager,
         wrap_to_height=False
         )
 
-def resize_textbox_fullheight_rightside(ui_textbox, current_Window, manager):
-    """Resize by kill and make again. Preserve text and width."""
+def resize_textbox_fullheight_rightside(ui_textbox, current_Window, manager, pool=None):
+    """Resize by kill and make again. Preserve text and width.
+
+    With an ElementPool, the same UITextBox is released and
+    acquired again at the new size instead.
+    """
     save_text = ui_textbox.html_text
     save_width = ui_textbox.relative_rect.width
     # save_textcolour = ui_textbox.text_colour
-    ui_textbox.kill()
+    if pool is not None: pool.release(ui_textbox)
+    else: ui_textbox.kill()
     new = make_textbox_fullheight_rightside(
         manager,
         current_Window,
         html_text=save_text,
-        width=save_width
+        width=save_width,
+        pool=pool
         )
     # ui_textbox.set_text(save_text)
     # ui_textbox.text_colour = save_textcolour
-    return ui_textbox
+    return new
 
-def resize_cmdline(cmdline_ui_element, current_Window, stack_level, manager):
+def resize_cmdline(cmdline_ui_element, current_Window, stack_level, manager, pool=None):
     """Resize by kill and make again. Preserve text and color.
 
+    With an ElementPool, the same UITextEntryLine is released and
+    acquired again at the new size instead.
+
     TODO
     ----
     Make cmdline into an object so the trailing parameters are
@@ -370,8 +562,9 @@ def resize_cmdline(cmdline_ui_element, current_Window, stack_level, manager):
     save_textcolour = cmdline_ui_element.text_colour
     # Lose focus before killing or the manager cannot focus again.
     if cmdline_ui_element.selected: manager.unselect_focus_element()
-    cmdline_ui_element.kill()
-    cmdline = make_cmdline(manager, current_Window, stack_level)
+    if pool is not None: pool.release(cmdline_ui_element)
+    else: cmdline_ui_element.kill()
+    cmdline = make_cmdline(manager, current_Window, stack_level, pool)
     cmdline.set_text(save_text)
     cmdline.text_colour = save_textcolour
     return cmdline
@@ -432,7 +625,9 @@ def user_opens_cmdline(key_pressed, key_mods):
     Returns false if user does not press colon
     Returns true if user presses colon
     """
-    return _user_pressed_colon(key_pressed, key_mods)
+    opens = _user_pressed_colon(key_pressed, key_mods)
+    if opens: _trace('open_cmdline')
+    return opens
 
 def user_closes_cmdline(key_pressed):
     """
@@ -443,6 +638,20 @@ def user_closes_cmdline(key_pressed):
     """
     return _user_pressed_Esc(key_pressed)
 
+def user_toggles_recording(key_pressed):
+    """
+    Behavior
+    --------
+    Returns False if user does not press F12
+    Returns True if user presses F12
+
+    Context
+    -------
+    Hotkey for the same thing as ':rec start' and ':rec stop'.
+    See 'toggle_recording()'.
+    """
+    return _user_pressed_F12(key_pressed)
+
 def evaluate(cmd):
     """
     Activate 'cmdline' with : to start a COLON command.
@@ -567,8 +776,189 @@ def evaluate(cmd):
                     cmdoutput.text_colour = pygame.Color(color_hex.saltwatertaffy)
                     # Strip the "OK: " from the response message
                     response = response.lstrip('OK: ')
+
+    Registered commands
+    -------------------
+    Commands added with 'register_command()' are handled inside
+    makeuppy. 'evaluate' calls the command function with the
+    text after the command name and returns its response.
+    Exceptions are caught and returned as an 'ERROR: ' string.
+
+    Commands that are not registered return None. The
+    application handles those (see ':eval' and ':start').
+
+    Commands added with 'declare_command()' (or a manifest, see
+    'load_command_manifest()') import their module the first time
+    they are evaluated.
+
+    :help
+        List registered and declared commands.
+        ':help name' shows the help line for one command.
+
+    Example: (command line responses)
+        :rec start
+        OK: recording to capture/
+    """
+    _trace('evaluate')
+    return run_compiled(compile_command(cmd))
+
+def compile_command(cmd): # -> CompiledCommand
+    """Parse 'cmd' once, to run it many times with 'run_compiled'.
+
+    'func' is None if the command is not registered: the
+    application handles it.
+    """
+    match = _cmd_pattern.match(str(cmd))
+    if match is None: return CompiledCommand(str(cmd), None, '')
+    name, args = match.groups()
+    command = _commands.get(name)
+    return CompiledCommand(str(cmd), command.func if command else None, args.strip())
+
+def run_compiled(compiled): # -> str or None
+    """Run a command from 'compile_command' like 'evaluate' would."""
+    if compiled.func is None: return None
+    try: return compiled.func(compiled.args)
+    except: return f"ERROR: {sys.exc_info()[1]}"
+
+Command = namedtuple('Command', [ 'name', 'func', 'help' ])
+CompiledCommand = namedtuple('CompiledCommand', [ 'text', 'func', 'args' ])
+_commands = {}
+_cmd_pattern = re.compile(r'\s*:?\s*(\w+)(.*)', re.DOTALL)
+
+def register_command(name, func, help=''):
+    """Make ':name' a COLON command handled by 'evaluate'.
+
+    Parameters
+    ----------
+    name:
+        type: str
+        Command name without the colon, e.g., 'rec' for ':rec'.
+    func:
+        Called with one argument: the text after the command
+        name, stripped of surrounding whitespace.
+        Return the response string, following the 'OK'/'ERROR'
+        convention described in 'evaluate'.
+    help:
+        type: str
+        One line describing the command.
+
+    Example
+    -------
+    def hello(args): return f"OK: hello {args}"
+    mukpy.register_command('hello', hello, 'Say hello')
+    mukpy.evaluate(':hello world') # -> 'OK: hello world'
     """
-    pass
+    _commands[name] = Command(name=name, func=func, help=help)
+
+def get_commands(): # -> dict
+    """Return dict of registered commands: {name: Command}."""
+    return dict(_commands)
+
+def declare_command(name, module, function, help=''):
+    """Register ':name' without importing the module that implements it.
+
+    'module' is imported the first time ':name' is evaluated (or
+    by 'prewarm_commands'). Until then, ':help' and
+    'complete_command' only use 'name' and 'help'.
+
+    Parameters
+    ----------
+    name:
+        type: str
+        Command name without the colon.
+    module:
+        type: str
+        Absolute module path, e.g., 'labtools.fit'.
+    function:
+        type: str
+        Name of the command function in 'module'. It is called
+        like functions passed to 'register_command'.
+    help:
+        type: str
+        One line describing the command.
+    """
+    def import_and_call(args):
+        return _import_command(name).func(args)
+    _declared[name] = (module, function)
+    _commands[name] = Command(name=name, func=import_and_call, help=help)
+
+def load_command_manifest(path):
+    """Declare every command listed in a JSON manifest.
+
+    Manifest format
+    ---------------
+    {
+      "fit":
+      {
+        "module": "labtools.fit",
+        "function": "fit_command",
+        "help": "Fit a Gaussian to the last sweep: :fit [center]"
+      }
+    }
+    """
+    with open(path) as manifest:
+        for name, entry in json.load(manifest).items():
+            declare_command(
+                name,
+                module=entry['module'],
+                function=entry['function'],
+                help=entry.get('help', '')
+                )
+
+def prewarm_commands(): # -> threading.Thread
+    """Import declared command modules in a background thread.
+
+    Call this after the first frame is on screen. Commands are
+    fast the first time they are used, and startup is not slowed
+    down by the imports.
+    """
+    warm = threading.Thread(target=_import_declared_commands, daemon=True)
+    warm.start()
+    return warm
+
+def complete_command(prefix): # -> list
+    """Return sorted names of commands that start with 'prefix'.
+
+    Leading ':' in 'prefix' is ignored.
+
+    Example
+    -------
+    complete_command(':re') # -> ['rec']
+    """
+    prefix = prefix.lstrip(':')
+    return sorted(name for name in _commands if name.startswith(prefix))
+
+def _import_command(name): # -> Command
+    """Import the module behind declared command 'name' and register it."""
+    declared = _declared.get(name)
+    if declared is None: return _commands[name] # already imported
+    module, function = declared
+    func = getattr(importlib.import_module(module), function)
+    command = _commands[name]._replace(func=func)
+    _commands[name] = command
+    _declared.pop(name, None)
+    return command
+
+def _import_declared_commands():
+    for name in list(_declared):
+        try: _import_command(name)
+        except: pass # report the error when the command is used
+
+def _help(args):
+    """
+    :help
+        List command names.
+    :help name
+        Show help for command 'name'.
+    """
+    if args == '':
+        return f"OK: {' '.join(sorted(_commands))}"
+    name = args.lstrip(':')
+    if name not in _commands: return f"ERROR: no command ':{name}'"
+    return f"OK: :{name} -- {_commands[name].help}"
+
+_declared = {} # {name: (module, function)} of commands not imported yet
+register_command('help', _help, 'List commands, or show help: :help [name]')
 
 # Credit color scheme to Steve Losh, author of badwolf.vim
 _badwolf_color_names = [
@@ -711,8 +1101,10 @@ ColorHEX = namedtuple(
 '''
 
 # ---Helpers---
-def _dev(condition=True): return DEV and condition
-def _cmd(condition=True): return CMD and condition
+def _dev(condition=True): return current_app().dev and condition
+def _cmd(condition=True): return current_app().cmd and condition
+
+def _trace(stage): pass # replaced by 'LatencyTracer.start()' to follow input through stages
 
 def _user_clicked_red_x(event): return event.type == pygame.QUIT
 
@@ -722,6 +1114,8 @@ def _user_pressed_semicolon(key_pressed): return key_pressed[pygame.K_SEMICOLON]
 
 def _user_pressed_Esc(key_pressed): return key_pressed[pygame.K_ESCAPE]
 
+def _user_pressed_F12(key_pressed): return key_pressed[pygame.K_F12]
+
 def _user_held_Ctrl(key_mods): return key_mods & pygame.KMOD_CTRL
 
 def _user_held_Shift(key_mods): return key_mods & pygame.KMOD_SHIFT
@@ -0,0 +1,346 @@
+"""Process each sweep through vectorised stages into preallocated buffers.
+
+A Pipeline is a list of stages. Each stage reads the previous stage's
+output and writes into buffers it allocated once, in 'setup()'. No
+stage allocates a sweep-sized array per sweep, so processing keeps up
+with the acquisition rate and does not churn memory.
+
+The input is never modified: it can be a read-only view of a shared
+memory slot (see 'AcquisitionProcess') or of a recording.
+
+Results are published to subscribers after every sweep, for example
+'Waterfall.add_row' or a function that redraws a plot.
+
+Example
+-------
+import makeuppy as mukpy
+dark = mukpy.DarkSubtraction()
+peak = mukpy.PeakTracker(n_peaks=2, window=6)
+pipeline = mukpy.Pipeline(n_pixels=2048, stages=[
+    dark,
+    mukpy.RunningAverage(8),
+    mukpy.Normalize(),
+    peak,
+    ])
+pipeline.subscribe(waterfall.add_row)
+# ...shutter closed...
+dark.set_dark(counts)
+# ...every sweep...
+spectrum = pipeline.process(counts) # view of the last stage's buffer
+print(peak.positions) # sub-pixel peak centres
+"""
+import numpy as np
+
+class Stage:
+    """Base class of pipeline stages.
+
+    Subclasses allocate their buffers in 'setup()' and override
+    'process()'. 'process()' returns an array of n_pixels: usually
+    the stage's own buffer, or its input if the stage only reads it.
+    """
+    def setup(self, n_pixels, dtype):
+        """Allocate buffers for sweeps of 'n_pixels'. Called by Pipeline."""
+        self.n_pixels = n_pixels
+        self.dtype = np.dtype(dtype)
+        self.out = np.zeros(n_pixels, dtype=self.dtype)
+        self.reset()
+
+    def reset(self):
+        """Forget previous sweeps (e.g. after a change of integration time)."""
+
+    def process(self, counts): # -> numpy.ndarray
+        """Return this stage's result for sweep 'counts'.
+
+        The default passes 'counts' through unchanged, as a stage
+        that only reads the sweep does.
+        """
+        return counts
+
+class RunningAverage(Stage):
+    """Average of the last 'n' sweeps.
+
+    Behavior
+    --------
+    Until 'n' sweeps arrive, averages the sweeps so far
+    Each sweep costs O(n_pixels), not O(n*n_pixels): a running sum
+    is updated with the new sweep and the sweep it replaces
+    The sum is recomputed each time the ring wraps, so rounding
+    errors do not build up
+    """
+    def __init__(self, n):
+        if n < 1: raise ValueError(f"n must be at least 1, not {n}")
+        self.n = n
+
+    def setup(self, n_pixels, dtype):
+        self.ring = np.zeros((self.n, n_pixels), dtype=dtype)
+        self.sum = np.zeros(n_pixels, dtype=dtype)
+        super().setup(n_pixels, dtype)
+
+    def reset(self):
+        self.ring[:] = 0
+        self.sum[:] = 0
+        self.count = 0
+
+    def process(self, counts):
+        slot = self.count % self.n
+        oldest = self.ring[slot]
+        self.sum -= oldest
+        oldest[:] = counts
+        self.count += 1
+        if slot == self.n - 1: np.sum(self.ring, axis=0, out=self.sum)
+        else: self.sum += oldest
+        np.divide(self.sum, min(self.count, self.n), out=self.out)
+        return self.out
+
+class ExponentialSmoothing(Stage):
+    """out += alpha*(counts - out). The first sweep is copied as is.
+
+    Parameters
+    ----------
+    alpha:
+        type: float, 0 < alpha <= 1
+        Weight of the newest sweep. Smaller is smoother and slower.
+    """
+    def __init__(self, alpha):
+        if not 0 < alpha <= 1: raise ValueError(f"alpha must be in (0, 1], not {alpha}")
+        self.alpha = alpha
+
+    def setup(self, n_pixels, dtype):
+        self._step = np.zeros(n_pixels, dtype=dtype)
+        super().setup(n_pixels, dtype)
+
+    def reset(self):
+        self.started = False
+
+    def process(self, counts):
+        if not self.started:
+            self.out[:] = counts
+            self.started = True
+            return self.out
+        np.subtract(counts, self.out, out=self._step)
+        self._step *= self.alpha
+        self.out += self._step
+        return self.out
+
+class DarkSubtraction(Stage):
+    """Subtract a dark sweep (shutter closed) from every sweep.
+
+    Until 'set_dark()' is called the dark sweep is all zeros.
+    """
+    def setup(self, n_pixels, dtype):
+        self.dark = np.zeros(n_pixels, dtype=dtype)
+        super().setup(n_pixels, dtype)
+
+    def set_dark(self, counts):
+        """Copy 'counts' as the dark sweep. Pass an averaged sweep for less noise."""
+        self.dark[:] = counts
+
+    def process(self, counts):
+        np.subtract(counts, self.dark, out=self.out)
+        return self.out
+
+class Normalize(Stage):
+    """Divide by a reference sweep, or scale the peak to 1.
+
+    Parameters
+    ----------
+    reference:
+        Sweep to divide by (e.g. lamp spectrum), or None to divide by
+        the largest value of each sweep. Pixels where the reference
+        is zero are set to zero.
+    """
+    def __init__(self, reference=None):
+        self.reference = None if reference is None else np.array(reference)
+
+    def setup(self, n_pixels, dtype):
+        super().setup(n_pixels, dtype)
+        if self.reference is not None:
+            reference = self.reference
+            self.reference = np.zeros(n_pixels, dtype=dtype)
+            self._valid = reference != 0
+            self.reference[self._valid] = reference[self._valid]
+
+    def process(self, counts):
+        if self.reference is None:
+            peak = counts.max()
+            if peak == 0: self.out[:] = 0
+            else: np.divide(counts, peak, out=self.out)
+        else:
+            self.out[:] = 0
+            np.divide(counts, self.reference, out=self.out, where=self._valid)
+        return self.out
+
+class PeakTracker(Stage):
+    """Find the 'n_peaks' highest peaks, then follow them sweep to sweep.
+
+    Behavior
+    --------
+    First sweep (and after 'reset()'): finds the highest local
+    maxima above 'threshold'
+    Later sweeps: each peak moves to the highest pixel within
+    'window' pixels of where it was
+    'positions' are sub-pixel: a parabola through the highest pixel
+    and its neighbours
+    Passes its input through unchanged
+
+    Parameters
+    ----------
+    n_peaks:
+        type: int
+        Number of peaks to track.
+    window:
+        type: int
+        Search this many pixels either side of each peak.
+    threshold:
+        Ignore local maxima at or below this value when finding peaks.
+        Default: no threshold.
+
+    Attributes
+    ----------
+    positions:
+        (n_peaks,) float pixel positions, NaN if not found.
+    heights:
+        (n_peaks,) counts at the highest pixel of each peak.
+    """
+    def __init__(self, n_peaks=1, window=8, threshold=None):
+        self.n_peaks = n_peaks
+        self.window = window
+        self.threshold = threshold
+        self._offsets = np.arange(-window, window + 1)
+
+    def setup(self, n_pixels, dtype):
+        self.positions = np.full(self.n_peaks, np.nan)
+        self.heights = np.zeros(self.n_peaks, dtype=dtype)
+        self._rising = np.zeros(n_pixels - 1, dtype=bool)
+        self._is_max = np.zeros(n_pixels - 2, dtype=bool)
+        self._index = np.zeros((self.n_peaks, len(self._offsets)), dtype=np.intp)
+        super().setup(n_pixels, dtype)
+
+    def reset(self):
+        self.positions[:] = np.nan
+        self.found = False
+
+    def process(self, counts):
+        if self.found: top = self._track(counts)
+        else: top = self._find(counts)
+        if top is not None: self._refine(counts, top)
+        return counts
+
+    def _find(self, counts): # -> numpy.ndarray or None
+        """Pixels of the highest local maxima, -1 for peaks not found."""
+        np.greater(counts[1:], counts[:-1], out=self._rising)
+        # Rising into the pixel and not rising out of it
+        np.greater(self._rising[:-1], self._rising[1:], out=self._is_max)
+        candidates = np.flatnonzero(self._is_max) + 1
+        if self.threshold is not None:
+            candidates = candidates[counts[candidates] > self.threshold]
+        if len(candidates) == 0: return None
+        highest = candidates[np.argsort(counts[candidates])[::-1][:self.n_peaks]]
+        top = np.full(self.n_peaks, -1, dtype=np.intp)
+        top[:len(highest)] = np.sort(highest)
+        self.found = True
+        return top
+
+    def _track(self, counts): # -> numpy.ndarray
+        """Pixel of the highest value near each peak, -1 for peaks not found."""
+        known = ~np.isnan(self.positions)
+        start = np.where(known, self.positions, 0).round().astype(np.intp)
+        np.add(start[:, np.newaxis], self._offsets, out=self._index)
+        np.clip(self._index, 0, self.n_pixels - 1, out=self._index)
+        nearby = counts[self._index] # n_peaks x (2*window + 1): small
+        top = self._index[np.arange(self.n_peaks), nearby.argmax(axis=1)]
+        return np.where(known, top, -1)
+
+    def _refine(self, counts, top):
+        """Sub-pixel centre of a parabola through each peak and its neighbours."""
+        self.positions[:] = np.nan
+        self.heights[:] = 0
+        slots = np.flatnonzero(top >= 0)
+        top = top[slots]
+        last = self.n_pixels - 1
+        # float: differences of unsigned counts must not wrap around
+        left = counts[np.maximum(top - 1, 0)].astype(float)
+        centre = counts[top].astype(float)
+        right = counts[np.minimum(top + 1, last)].astype(float)
+        curve = left - 2*centre + right
+        shift = np.zeros(len(top))
+        inside = (top > 0) & (top < last) & (curve < 0)
+        np.divide(0.5*(left - right), curve, out=shift, where=inside)
+        self.positions[slots] = top + shift
+        self.heights[slots] = centre
+
+class Pipeline:
+    """Run each sweep through 'stages' in order and publish the result.
+
+    Behavior
+    --------
+    process(counts) returns the last stage's output buffer, not a copy:
+    the next sweep overwrites it
+    Counts of another data type are first copied into an input
+    buffer of 'dtype'; counts of 'dtype' are used as they are, so
+    with only pass-through stages the result is 'counts' itself
+    Subscribers are called with the result after every sweep
+    Stages are set up for 'n_pixels' when added, never per sweep
+
+    Parameters
+    ----------
+    n_pixels:
+        type: int
+        Length of one sweep.
+    stages:
+        Stage instances, run first to last.
+    dtype:
+        Data type of the stage buffers and of what every stage
+        receives. Counts of any numeric type (e.g. uint16 from the
+        detector) are converted on the way in.
+    """
+    def __init__(self, n_pixels, stages=(), dtype='f8'):
+        self.n_pixels = n_pixels
+        self.dtype = np.dtype(dtype)
+        self.stages = []
+        self.output = None # result of the last sweep
+        self.count = 0
+        self._subscribers = []
+        self._input = np.zeros(n_pixels, dtype=self.dtype) # counts of another dtype, converted
+        for stage in stages: self.add(stage)
+
+    def add(self, stage): # -> Stage
+        """Set up 'stage' and run it after the stages already added."""
+        stage.setup(self.n_pixels, self.dtype)
+        self.stages.append(stage)
+        return stage
+
+    def subscribe(self, func):
+        """Call func(result) after every sweep, e.g. 'waterfall.add_row'."""
+        self._subscribers.append(func)
+
+    def unsubscribe(self, func):
+        self._subscribers.remove(func)
+
+    def reset(self):
+        """Reset every stage: averages and tracked peaks start over."""
+        for stage in self.stages: stage.reset()
+        self.output = None
+        self.count = 0
+
+    def process(self, counts, out=None): # -> numpy.ndarray
+        """Run 'counts' through the stages. Return the result.
+
+        'out' (e.g. a slot from 'SweepSlots.begin()') gets a copy of
+        the result and is returned instead.
+        """
+        counts = np.asarray(counts)
+        if len(counts) != self.n_pixels:
+            raise ValueError(f"sweep has {len(counts)} pixels, pipeline expects {self.n_pixels}")
+        if counts.dtype != self.dtype:
+            np.copyto(self._input, counts, casting='unsafe')
+            counts = self._input
+        result = counts
+        for stage in self.stages: result = stage.process(result)
+        if out is not None:
+            out[:] = result
+            result = out
+        self.output = result
+        self.count += 1
+        for func in self._subscribers: func(result)
+        return result
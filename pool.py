@@ -0,0 +1,149 @@
+"""Reuse pygame_gui elements instead of killing them and making new ones.
+
+Making an element resolves its theme (colours, font, misc data) and
+allocates its Surfaces. Panels that come and go (result popups,
+per-channel readouts) and the resize-by-remake of the command line
+repeat that work every time.
+
+An ElementPool hides released elements instead of killing them: they
+leave the manager's sprite group and their container, so they are not
+drawn, updated or sent events. 'acquire()' hands a hidden element of
+the same type and theme object ID back out, moved to the new rect.
+Theme resolution happens once per element per session.
+
+Example
+-------
+import makeuppy as mukpy
+pool = mukpy.ElementPool(manager)
+# Show a result popup
+popup = pool.acquire(
+    pygame_gui.elements.UITextBox, pygame.Rect(100,100,300,120),
+    object_id='#result', html_text=f'<b>peak</b> {nm:.2f} nm'
+    )
+# ...user closes it...
+pool.release(popup) # hidden, text and colours reset
+
+# The command line helpers take a pool too
+cmdline = mukpy.make_cmdline(manager, windowed, stack_level=2, pool=pool)
+cmdline = mukpy.resize_cmdline(cmdline, fullscreen, 2, manager, pool=pool)
+"""
+import pygame
+
+class ElementPool:
+    """Free lists of hidden elements of 'manager', keyed by (type, object_id).
+
+    Behavior
+    --------
+    acquire() makes a new element only if none of that type and
+    object ID is free
+    release() hides the element, clears its text and puts its
+    colours back to the theme colours it was made with
+    A reused element is resized (and rebuilt) only if its width or
+    height changed; otherwise it is only moved
+
+    Parameters
+    ----------
+    manager:
+        pygame_gui UIManager that owns the elements.
+    """
+    _colours = ('text_colour', 'selected_text_colour', 'background_colour',
+                'selected_bg_colour', 'border_colour')
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.created = 0
+        self.reused = 0
+        self._free = {} # {(element type, object_id): [hidden elements]}
+        self._keys = {} # {element: (element type, object_id)}
+        self._defaults = {} # {element: {colour attribute: theme colour}}
+
+    def __len__(self): return sum(len(free) for free in self._free.values())
+
+    def acquire(self, element_type, relative_rect, object_id=None, **kwargs): # -> UIElement
+        """Return a visible element of 'element_type' at 'relative_rect'.
+
+        'kwargs' go to the constructor of a new element. A reused
+        UITextBox takes the new 'html_text' from 'kwargs'.
+        """
+        relative_rect = pygame.Rect(relative_rect)
+        key = (element_type, object_id)
+        free = self._free.get(key)
+        if not free:
+            element = element_type(
+                relative_rect=relative_rect, manager=self.manager,
+                object_id=object_id, **kwargs
+                )
+            self._keys[element] = key
+            self._defaults[element] = {
+                name: getattr(element, name) for name in self._colours
+                if getattr(element, name, None) is not None
+                }
+            self.created += 1
+            return element
+        element = free.pop()
+        show_element(element)
+        self._place(element, relative_rect, kwargs.get('html_text'))
+        self.reused += 1
+        return element
+
+    def release(self, element):
+        """Hide 'element' and keep it for the next 'acquire()'."""
+        key = self._keys.get(element)
+        if key is None: raise ValueError("element was not made by this pool")
+        if self.manager.select_focused_element is element:
+            self.manager.unselect_focus_element()
+        for name, colour in self._defaults[element].items(): setattr(element, name, colour)
+        if hasattr(element, 'set_text'): element.set_text('') # redraws with the colours
+        scroll_bar = getattr(element, 'scroll_bar', None)
+        if scroll_bar is not None:
+            scroll_bar.kill() # remade by rebuild() if the next text needs it
+            element.scroll_bar = None
+        hide_element(element)
+        self._free.setdefault(key, []).append(element)
+
+    def clear(self):
+        """Kill every hidden element."""
+        for free in self._free.values():
+            for element in free:
+                show_element(element) # kill() expects the group and container
+                element.kill()
+                del self._keys[element], self._defaults[element]
+        self._free.clear()
+
+    def stats(self): # -> dict
+        return {'created': self.created, 'reused': self.reused, 'free': len(self)}
+
+    def _place(self, element, relative_rect, html_text):
+        """Move to 'relative_rect'; rebuild only for a new size or new text."""
+        rebuild = html_text is not None
+        if html_text is not None: element.html_text = html_text
+        width_changed = relative_rect.width != element.relative_rect.width
+        # Height 0 means 'from the font' (see make_cmdline)
+        height_changed = relative_rect.height and relative_rect.height != element.relative_rect.height
+        if width_changed or height_changed:
+            element.relative_rect.width = element.rect.width = relative_rect.width
+            if height_changed: element.relative_rect.height = element.rect.height = relative_rect.height
+            rebuild = True
+        element.relative_rect.topleft = relative_rect.topleft
+        element.update_containing_rect_position() # moves rect and drawn shape
+        if rebuild: element.rebuild()
+
+def hide_element(element):
+    """Take 'element' out of its manager's sprite group and container.
+
+    It is not drawn, updated or sent events until 'show_element()'.
+    pygame_gui 0.4 elements have no hide()/show().
+    """
+    if not element.alive(): return
+    element.ui_container.remove_element(element)
+    pygame.sprite.Sprite.kill(element) # leave the sprite group: not UIElement.kill
+    scroll_bar = getattr(element, 'scroll_bar', None) # UITextBox
+    if scroll_bar is not None: hide_element(scroll_bar)
+
+def show_element(element):
+    """Put an element hidden by 'hide_element()' back."""
+    if element.alive(): return
+    element.ui_group.add(element)
+    element.ui_container.add_element(element) # sets the layer again
+    scroll_bar = getattr(element, 'scroll_bar', None)
+    if scroll_bar is not None: show_element(scroll_bar)
@@ -0,0 +1,217 @@
+"""Sampling profiler for a running session: ':prof sample 10'.
+
+cProfile traces every call and slows the GUI down so much that the
+timings no longer mean much. The SamplingProfiler instead wakes up a
+background thread 'rate' times per second, reads the stack of every
+other thread from 'sys._current_frames()', and counts each distinct
+stack. At 100 Hz this costs well under 2% of one core; the overhead
+is measured and reported.
+
+When the sampling window ends the counts are written as collapsed
+stacks (one 'thread;outer;...;inner count' line per stack, for
+flamegraph.pl, speedscope and most flame graph viewers) or as a
+speedscope JSON file.
+
+COLON commands
+--------------
+:prof sample seconds [rate] [collapsed|speedscope]
+    Sample for 'seconds' at 'rate' Hz (default 100), then write
+    the file to 'prof/'.
+:prof stop
+    Stop now and write the file.
+:prof
+    Show the status or the last file written.
+
+Example
+-------
+import makeuppy as mukpy
+mukpy.sampling_profiler.start(seconds=10, fmt='speedscope')
+# ...10 s later: prof/20240101-120000.speedscope.json
+# Or from the command line:
+#   :prof sample 10
+#   OK: sampling 10 s at 100 Hz
+#   :prof
+#   OK: prof/20240101-120000.txt: 1000 samples, 12 stacks, overhead 0.3%
+"""
+import json
+import os
+import sys
+import threading # sampler thread reads the other threads' stacks
+import time
+from collections import Counter
+from . import makeuppy as _mukpy
+
+class SamplingProfiler:
+    """Count thread stacks sampled from a background thread.
+
+    Behavior
+    --------
+    The sampler thread does not sample itself
+    A stack is a tuple of code objects, outermost first, so a
+    sample costs a frame walk and a Counter increment; names are
+    only made when the file is written
+    start() while sampling raises RuntimeError
+
+    Parameters
+    ----------
+    out_dir:
+        Files go in 'out_dir', named by start time.
+    max_depth:
+        Stacks deeper than this keep their innermost 'max_depth'
+        frames.
+    """
+    formats = ('collapsed', 'speedscope')
+
+    def __init__(self, out_dir='prof', max_depth=128):
+        self.out_dir = out_dir
+        self.max_depth = max_depth
+        self.stacks = Counter() # {(thread name, (code, ...)): samples}
+        self.samples = 0
+        self.sampling_time = 0.0 # seconds spent taking samples
+        self.elapsed = 0.0
+        self.path = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def sampling(self): return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=None, rate=100, fmt='collapsed'): # -> None
+        """Sample at 'rate' Hz for 'seconds' (None: until stop()), then write the file."""
+        if self.sampling: raise RuntimeError("already sampling, ':prof stop' first")
+        if fmt not in self.formats: raise ValueError(f"fmt must be one of {self.formats}")
+        self.stacks = Counter()
+        self.samples = 0
+        self.sampling_time = 0.0
+        self.elapsed = 0.0
+        self.path = None
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(seconds, 1/rate, fmt),
+            name='SamplingProfiler', daemon=True
+            )
+        self._thread.start()
+
+    def stop(self): # -> str or None
+        """Stop sampling, wait for the file. Return its path."""
+        self._stop.set()
+        if self._thread is not None: self._thread.join()
+        return self.path
+
+    def sample(self):
+        """Take one sample of every thread but the calling one."""
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me: continue
+            codes = []
+            while frame is not None and len(codes) < self.max_depth:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            codes.reverse()
+            self.stacks[(names.get(ident, str(ident)), tuple(codes))] += 1
+        self.samples += 1
+
+    def overhead(self): # -> float
+        """Fraction of wall time the sampler held the interpreter."""
+        return self.sampling_time/self.elapsed if self.elapsed else 0.0
+
+    def collapsed(self): # -> str
+        """Collapsed stacks: 'thread;outer;...;inner count' per line."""
+        names = {}
+        lines = [
+            ';'.join([thread] + [_frame_name(code, names) for code in codes]) + f' {count}'
+            for (thread, codes), count in self.stacks.most_common()
+            ]
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self): # -> dict
+        """Speedscope 'sampled' profiles, one per thread."""
+        frames, index = [], {}
+        profiles = {}
+        for (thread, codes), count in self.stacks.items():
+            stack = []
+            for code in codes:
+                if code not in index:
+                    index[code] = len(frames)
+                    frames.append({'name': code.co_name, 'file': code.co_filename,
+                                   'line': code.co_firstlineno})
+                stack.append(index[code])
+            profile = profiles.setdefault(thread, {'samples': [], 'weights': []})
+            profile['samples'].append(stack)
+            profile['weights'].append(count)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [
+                {'type': 'sampled', 'name': thread, 'unit': 'none',
+                 'startValue': 0, 'endValue': sum(profile['weights']), **profile}
+                for thread, profile in profiles.items()
+                ],
+            'exporter': 'makeuppy SamplingProfiler',
+            }
+
+    def write(self, path, fmt='collapsed'):
+        folder = os.path.dirname(path)
+        if folder: os.makedirs(folder, exist_ok=True)
+        with open(path, 'w') as file:
+            if fmt == 'speedscope': json.dump(self.speedscope(), file)
+            else: file.write(self.collapsed())
+
+    def status(self): # -> str
+        if self.sampling: return f"sampling, {self.samples} samples so far"
+        if self.path is None: return "not sampling"
+        return (f"{self.path}: {self.samples} samples, {len(self.stacks)} stacks, "
+                f"overhead {100*self.overhead():.1f}%")
+
+    def _run(self, seconds, interval, fmt):
+        start = time.perf_counter()
+        end = None if seconds is None else start + seconds
+        next_sample = start
+        clock = time.perf_counter
+        while True:
+            now = clock()
+            if end is not None and now >= end: break
+            self.sample()
+            self.sampling_time += clock() - now
+            next_sample = max(next_sample + interval, clock()) # fell behind: no catch-up burst
+            if self._stop.wait(next_sample - clock()): break
+        self.elapsed = clock() - start
+        extension = '.speedscope.json' if fmt == 'speedscope' else '.txt'
+        path = os.path.join(self.out_dir, time.strftime('%Y%m%d-%H%M%S') + extension)
+        self.write(path, fmt)
+        self.path = path
+
+def _frame_name(code, names): # -> str
+    """'module:function' for collapsed stacks (no ';' or spaces)."""
+    name = names.get(code)
+    if name is None:
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        name = names[code] = f"{module}:{code.co_name}".replace(';', ',').replace(' ', '_')
+    return name
+
+# ---Default profiler for ':prof'---
+sampling_profiler = SamplingProfiler()
+
+def _prof(args):
+    """:prof sample seconds [rate] [collapsed|speedscope] | :prof stop | :prof"""
+    words = args.split()
+    if not words: return f"OK: {sampling_profiler.status()}"
+    if words == ['stop']:
+        if not sampling_profiler.sampling: return "ERROR: not sampling"
+        sampling_profiler.stop()
+        return f"OK: {sampling_profiler.status()}"
+    if words[0] == 'sample' and len(words) >= 2:
+        fmt = 'collapsed'
+        numbers = []
+        for word in words[1:]:
+            if word in SamplingProfiler.formats: fmt = word
+            else: numbers.append(float(word))
+        if len(numbers) not in (1, 2) or min(numbers) <= 0:
+            return "ERROR: expected ':prof sample seconds [rate]'"
+        seconds, rate = numbers[0], numbers[1] if len(numbers) == 2 else 100
+        sampling_profiler.start(seconds, rate, fmt)
+        return f"OK: sampling {seconds:g} s at {rate:g} Hz"
+    return f"ERROR: expected ':prof sample seconds' or ':prof stop', got ':prof {args}'"
+
+_mukpy.register_command('prof', _prof, 'Sampling profiler: :prof sample seconds [rate] [collapsed|speedscope] | stop')
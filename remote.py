@@ -0,0 +1,263 @@
+"""Drive the GUI from scripts with the same COLON commands the user types.
+
+RemoteServer listens on a local Unix socket (TCP on localhost on
+Windows) from an asyncio loop in a helper thread. Requests wait in a
+queue until the application calls 'server.process()' once per frame.
+Commands then run on the UI thread, through 'evaluate' or the
+application's own handler, so they can touch pygame and the UI
+elements safely.
+
+Protocol
+--------
+One JSON object per line in each direction. A request is a batch of
+commands; the answer holds one response per command, in order:
+    -> {"id": 1, "commands": [":rec start", ":stats ui"]}
+    <- {"id": 1, "responses": [{"ok": true, "response": "OK: ..."}, ...]}
+'response' is null if the handler returns None (command not handled).
+Send many requests without waiting for answers (pipelining): every
+request that arrives before the next frame runs in that frame.
+
+Example
+-------
+# Application
+import makeuppy as mukpy
+server = mukpy.RemoteServer(handler=app_evaluate) # default: mukpy.evaluate
+server.start()
+while not quit:
+    server.process() # run scripted commands, once per frame
+    # ...events, draw, update...
+server.stop()
+
+# Script
+import makeuppy as mukpy
+with mukpy.RemoteClient(server_address) as gui:
+    gui.run(':start')
+    gui.run_many([[':rec start'], [':stats ui'], [':rec stop']])
+"""
+import asyncio
+import errno
+import json
+import os
+import queue # hand-off from asyncio thread to UI thread
+import socket
+import stat
+import tempfile
+import threading
+from . import makeuppy as _mukpy
+
+def default_address(): # -> str or (host, port)
+    """Unix socket in the temp folder, or a free localhost port on Windows."""
+    if hasattr(socket, 'AF_UNIX'):
+        return os.path.join(tempfile.gettempdir(), f'makeuppy-{os.getpid()}.sock')
+    return ('127.0.0.1', 0)
+
+class RemoteServer:
+    """Accept command batches from local clients; run them in 'process()'.
+
+    Parameters
+    ----------
+    address:
+        Path of a Unix socket, or (host, port) for TCP.
+        Default: see 'default_address()'. After 'start()',
+        'address' is the address clients connect to.
+    handler:
+        Called with each command string on the UI thread. Returns
+        the response string, or None. Default: 'evaluate'.
+    """
+    def __init__(self, address=None, handler=None):
+        self.address = address if address is not None else default_address()
+        self.handler = handler if handler is not None else _mukpy.evaluate
+        self._requests = queue.Queue()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._error = None
+
+    def start(self):
+        """Start listening. Returns after the socket is ready.
+
+        Raises the error if the socket cannot be opened (e.g. the
+        port is in use, or another server listens on the Unix
+        socket). A Unix socket left behind by a server that died is
+        replaced.
+        """
+        ready = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._serve, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+
+    def stop(self):
+        """Stop listening and close client connections."""
+        if self._loop is None: return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def process(self, max_requests=None): # -> int
+        """Run queued command batches. Call once per frame on the UI thread.
+
+        Returns the number of requests run.
+        'max_requests' limits the time spent in one frame.
+        """
+        if self._loop is None: return 0
+        done = 0
+        while max_requests is None or done < max_requests:
+            try: commands, answer = self._requests.get_nowait()
+            except queue.Empty: break
+            responses = [self._run(command) for command in commands]
+            self._loop.call_soon_threadsafe(_set_result, answer, responses)
+            done += 1
+        return done
+
+    def _run(self, command): # -> dict
+        try: response = self.handler(command)
+        except Exception as error: response = f"ERROR: {error}"
+        if response is None: return {'ok': False, 'response': None}
+        response = str(response)
+        return {'ok': not response.startswith('ERROR'), 'response': response}
+
+    def _serve(self, ready):
+        """Helper thread: run the asyncio loop until 'stop()'."""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        try:
+            if isinstance(self.address, str):
+                _remove_stale_socket(self.address)
+                start = asyncio.start_unix_server(self._client, path=self.address)
+            else:
+                start = asyncio.start_server(self._client, *self.address)
+            self._server = loop.run_until_complete(start)
+            if not isinstance(self.address, str):
+                self.address = self._server.sockets[0].getsockname()[:2]
+        except Exception as error: # e.g. port in use: start() raises it
+            self._error = error
+            self._loop = None
+            loop.close()
+            return
+        finally: ready.set() # start() must not wait forever
+        try: loop.run_forever()
+        finally:
+            self._server.close()
+            for task in asyncio.all_tasks(loop): task.cancel()
+            loop.run_until_complete(asyncio.sleep(0)) # let tasks see cancel
+            loop.close()
+
+    async def _client(self, reader, writer):
+        """One connection: queue each request, write answers in order."""
+        answers = asyncio.Queue()
+        replies = asyncio.ensure_future(self._reply(answers, writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                answer = self._loop.create_future()
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request['commands'], list):
+                        raise TypeError("'commands' must be a list")
+                    commands = [str(command) for command in request['commands']]
+                except (ValueError, KeyError, TypeError) as error:
+                    answer.set_result(f"ERROR: bad request: {error}")
+                    await answers.put((None, answer))
+                    continue
+                self._requests.put((commands, answer))
+                await answers.put((request.get('id'), answer))
+        finally:
+            await answers.put(None)
+            await replies
+
+    async def _reply(self, answers, writer):
+        try:
+            while True:
+                item = await answers.get()
+                if item is None: break
+                ident, answer = item
+                result = await answer
+                if isinstance(result, str): reply = {'id': ident, 'error': result}
+                else: reply = {'id': ident, 'responses': result}
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError): pass
+        finally: writer.close()
+
+def _remove_stale_socket(path):
+    """Remove the Unix socket at 'path' if no server listens on it."""
+    try: mode = os.stat(path).st_mode
+    except FileNotFoundError: return
+    if not stat.S_ISSOCK(mode): return # not a socket: leave it, listening fails
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try: probe.connect(path)
+        except ConnectionRefusedError: # left behind by a server that died
+            os.remove(path)
+            return
+    raise OSError(errno.EADDRINUSE, f"a server is already listening on {path}")
+
+def _set_result(future, result):
+    if not future.done(): future.set_result(result)
+
+class RemoteClient:
+    """Send COLON commands to a RemoteServer and read the responses.
+
+    Parameters
+    ----------
+    address:
+        'server.address' of the RemoteServer.
+    timeout:
+        Seconds to wait for an answer. The server answers once per
+        frame, so allow at least a few frames.
+    """
+    def __init__(self, address, timeout=10.0):
+        if isinstance(address, str):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(address)
+        else:
+            self._socket = socket.create_connection(tuple(address), timeout=timeout)
+        self._lines = self._socket.makefile('rb')
+        self._next_id = 0
+
+    def run(self, *commands): # -> list
+        """Run 'commands' as one batch. Return their response strings."""
+        return self.run_many([commands])[0]
+
+    def run_many(self, batches, window=64): # -> list
+        """Pipeline 'batches' of commands. Return a list of responses per batch.
+
+        Up to 'window' requests are sent before waiting for an
+        answer, so many batches run in the same frame.
+        A response is the command's response string, or None if
+        the command was not handled.
+        """
+        batches = list(batches)
+        results = []
+        sent = 0
+        while len(results) < len(batches):
+            while sent < len(batches) and sent - len(results) < window:
+                self._send(batches[sent])
+                sent += 1
+            results.append(self._receive())
+        return results
+
+    def _send(self, batch):
+        self._next_id += 1
+        request = {'id': self._next_id, 'commands': list(batch)}
+        self._socket.sendall(json.dumps(request).encode() + b'\n')
+
+    def _receive(self): # -> list
+        reply = json.loads(self._lines.readline())
+        if 'error' in reply: raise ValueError(reply['error'])
+        return [item['response'] for item in reply['responses']]
+
+    def close(self):
+        self._lines.close()
+        self._socket.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc_info): self.close()
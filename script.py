@@ -0,0 +1,256 @@
+"""Run scripts of COLON commands with ':source file.mkp'.
+
+The whole script is parsed once, before anything runs: variables are
+substituted, loops are unrolled and every command is looked up. The
+result is a flat list of precompiled commands (see 'compile_command').
+Mistakes (unknown command, missing 'end', undefined variable) are
+reported with their line number and nothing runs.
+
+The list then runs a few milliseconds per frame from the scheduler, so
+the GUI keeps drawing. Progress goes to 'scripts.status', an
+Observable to bind to the command output line.
+
+Script syntax
+-------------
+# comment
+set lamp hg-ar            # variable, used as $lamp or ${lamp}
+:cal usb4000              # any COLON command (the colon is optional)
+for nm in range 400 700 10
+    :move $nm             # runs with nm = 400, 410, ..., 690
+    :start
+end
+for name in dark lamp sample
+    :rec start $name
+end
+repeat 3
+    :stats ui
+end
+
+Example
+-------
+import makeuppy as mukpy
+mukpy.scripts.handler = app_evaluate # commands the application handles
+mukpy.bindings.bind_text(mukpy.scripts.status, cmdoutput)
+# Command line:
+#   :source calibrate.mkp lamp=xenon
+#   OK: calibrate.mkp 1200/10000
+#   :source stop
+"""
+import os
+import re
+import time
+from . import makeuppy as _mukpy
+from . import timers as _timers
+from .bindings import Observable as _Observable
+
+class ScriptError(Exception):
+    """A script that cannot be compiled. The message has the line number."""
+
+_variable = re.compile(r'\$(\w+)|\$\{(\w+)\}')
+
+def compile_script(text, variables=None, handled=None, name='<script>'): # -> list
+    """Return [(line number, CompiledCommand), ...] for script 'text'.
+
+    Parameters
+    ----------
+    variables:
+        dict of starting variables, e.g. from ':source file nm=500'.
+    handled:
+        Called with a command name that is not registered. True if
+        the application handles it. Default: only registered
+        commands are allowed.
+    """
+    lines = [(number, line.strip()) for number, line in enumerate(text.splitlines(), 1)]
+    lines = [(number, line) for number, line in lines if line and not line.startswith('#')]
+    steps = []
+    end = _compile_block(lines, 0, dict(variables or {}), handled, name, steps)
+    if end < len(lines):
+        raise ScriptError(f"{name} line {lines[end][0]}: 'end' without 'for' or 'repeat'")
+    return steps
+
+def _compile_block(lines, start, variables, handled, name, steps): # -> int
+    """Compile lines from 'start' up to the matching 'end'. Return its index."""
+    index = start
+    while index < len(lines):
+        number, line = lines[index]
+        where = f"{name} line {number}"
+        words = line.split()
+        keyword = words[0]
+        if keyword == 'end': return index
+        if keyword == 'set':
+            if len(words) < 3: raise ScriptError(f"{where}: expected 'set name value'")
+            variables[words[1]] = _substitute(' '.join(words[2:]), variables, where)
+            index += 1
+        elif keyword in ('for', 'repeat'):
+            if keyword == 'for':
+                if len(words) < 4 or words[2] != 'in':
+                    raise ScriptError(f"{where}: expected 'for name in values' or 'for name in range start stop [step]'")
+                values = _for_values(_substitute(' '.join(words[3:]), variables, where).split(), where)
+            else:
+                if len(words) != 2: raise ScriptError(f"{where}: expected 'repeat count'")
+                try: values = range(int(_substitute(words[1], variables, where)))
+                except ValueError: raise ScriptError(f"{where}: repeat count must be an integer") from None
+            body, end = index + 1, None
+            for value in values:
+                if keyword == 'for': variables[words[1]] = value
+                end = _compile_block(lines, body, variables, handled, name, steps)
+            if end is None: # no iterations: still find 'end' and report errors
+                dry = dict(variables, **({words[1]: ''} if keyword == 'for' else {}))
+                end = _compile_block(lines, body, dry, handled, name, [])
+            if end == len(lines): raise ScriptError(f"{where}: '{keyword}' has no 'end'")
+            index = end + 1
+        else:
+            command = _mukpy.compile_command(_substitute(line, variables, where))
+            if command.func is None:
+                match = _mukpy._cmd_pattern.match(command.text)
+                command_name = match.group(1) if match else command.text
+                if handled is None or not handled(command_name):
+                    raise ScriptError(f"{where}: ':{command_name}' is not a registered command")
+            steps.append((number, command))
+            index += 1
+    return index
+
+def _substitute(text, variables, where): # -> str
+    def value(match):
+        key = match.group(1) or match.group(2)
+        if key not in variables: raise ScriptError(f"{where}: '${key}' is not set")
+        return str(variables[key])
+    return _variable.sub(value, text)
+
+def _for_values(words, where): # -> list
+    if words[0] != 'range': return words
+    try: numbers = [float(word) for word in words[1:]]
+    except ValueError: numbers = []
+    if len(numbers) not in (2, 3) or (len(numbers) == 3 and numbers[2] == 0):
+        raise ScriptError(f"{where}: expected 'range start stop [step]'")
+    start, stop = numbers[:2]
+    step = numbers[2] if len(numbers) == 3 else 1.0
+    count = max(0, int(-((start - stop)//step))) # ceil((stop - start)/step)
+    values = [start + i*step for i in range(count)]
+    if all(number.is_integer() for number in (start, stop, step)):
+        return [str(int(value)) for value in values]
+    return [repr(value) for value in values]
+
+class ScriptRun:
+    """A compiled script running a time budget's worth of commands per call.
+
+    Parameters
+    ----------
+    steps:
+        From 'compile_script'.
+    handler:
+        Called with the text of commands that are not registered.
+    stop_on_error:
+        Stop at the first response starting with 'ERROR'.
+    """
+    def __init__(self, steps, handler=None, name='<script>', stop_on_error=True):
+        self.steps = steps
+        self.handler = handler
+        self.name = name
+        self.stop_on_error = stop_on_error
+        self.done = 0
+        self.error = None
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+    @property
+    def running(self): return self.elapsed is None
+
+    def step(self, budget=0.004): # -> bool
+        """Run commands for up to 'budget' seconds. Return True while running."""
+        if not self.running: return False
+        deadline = time.perf_counter() + budget
+        steps, run = self.steps, _mukpy.run_compiled
+        while self.done < len(steps):
+            number, command = steps[self.done]
+            if command.func is not None: response = run(command)
+            else:
+                try: response = self.handler(command.text)
+                except Exception as error: response = f"ERROR: {error}"
+            self.done += 1
+            if self.stop_on_error and str(response).startswith('ERROR'):
+                self.error = f"ERROR: {self.name} line {number}: {str(response)[len('ERROR: '):]}"
+                break
+            if time.perf_counter() >= deadline: return True
+        self.elapsed = time.perf_counter() - self.started
+        return False
+
+    def stop(self):
+        if self.running: self.elapsed = time.perf_counter() - self.started
+
+    def status(self): # -> str
+        if self.error: return self.error
+        if self.running: return f"OK: {self.name} {self.done}/{len(self.steps)}"
+        if self.done < len(self.steps):
+            return f"OK: {self.name} stopped at {self.done}/{len(self.steps)}"
+        return f"OK: {self.name} done, {self.done} commands in {self.elapsed:.1f} s"
+
+class ScriptRunner:
+    """Run one script at a time from the scheduler, a slice per frame.
+
+    Attributes
+    ----------
+    handler:
+        Runs commands the application handles (':start', ':eval',
+        ...): called with the command text, returns the response.
+        None: scripts may only use registered commands.
+    status:
+        Observable with the progress line, e.g. 'OK: cal.mkp 12/40'.
+    budget:
+        Seconds of script per scheduler tick.
+    """
+    def __init__(self, handler=None, budget=0.004, interval=0.001):
+        self.handler = handler
+        self.budget = budget
+        self.interval = interval
+        self.status = _Observable('')
+        self.run = None
+        self._timer = None
+
+    def source(self, path, variables=None, scheduler=None): # -> ScriptRun
+        """Compile script file 'path' and start running it."""
+        if self.run is not None and self.run.running:
+            raise ScriptError(f"{self.run.name} is still running, ':source stop' first")
+        with open(path) as file: text = file.read()
+        name = os.path.basename(path)
+        handled = (lambda command_name: True) if self.handler is not None else None
+        steps = compile_script(text, variables, handled, name)
+        self.run = ScriptRun(steps, self.handler, name)
+        self.status.set(self.run.status())
+        if scheduler is None: scheduler = _timers.scheduler
+        self._timer = scheduler.call_every(self.interval, self._tick)
+        return self.run
+
+    def stop(self):
+        if self.run is None: return
+        self.run.stop()
+        self._tick()
+
+    def _tick(self):
+        running = self.run.step(self.budget)
+        self.status.set(self.run.status())
+        if not running and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+# ---Default runner for ':source'---
+scripts = ScriptRunner()
+
+def _source(args):
+    """:source file.mkp [name=value ...] | :source stop | :source"""
+    words = args.split()
+    if not words:
+        return scripts.status.get() or "OK: no script has run"
+    if words == ['stop']:
+        scripts.stop()
+        return scripts.status.get() or "OK: no script is running"
+    variables = {}
+    for word in words[1:]:
+        key, equals, value = word.partition('=')
+        if not equals: return f"ERROR: expected name=value, got '{word}'"
+        variables[key] = value
+    try: run = scripts.source(words[0], variables)
+    except ScriptError as error: return f"ERROR: {error}"
+    return f"OK: {run.name}: {len(run.steps)} commands"
+
+_mukpy.register_command('source', _source, 'Run a command script: :source file.mkp [name=value ...] | stop')
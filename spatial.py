@@ -0,0 +1,247 @@
+"""Spatial index of element rects for hover, click routing and dirty rects.
+
+pygame_gui checks every element for hover on every update. With
+hundreds of elements (readout grids, button matrices) that scan is most
+of the cost of moving the mouse.
+
+GridIndex buckets rects into a uniform grid of square cells. A point
+query looks in one cell; a rect query looks in the cells the rect
+covers. Moving a rect only touches the cells it enters and leaves.
+
+IndexedUIManager is a pygame_gui UIManager that keeps a GridIndex of
+its elements: elements are added and removed as they are made and
+killed, and hover and clicks are checked only for elements under the
+mouse. Elements are re-indexed when they move or resize through
+their own methods (set_position, set_dimensions, ...), as scroll bar
+thumbs and dragged windows do.
+
+Example
+-------
+import makeuppy as mukpy
+manager = mukpy.new_ui_manager(windowed, indexed=True)
+# ...build a 20x30 grid of readouts...
+manager.process_events(event) # clicks: only elements under the mouse
+manager.update(time_delta) # hover: only elements under the mouse
+button = manager.element_at(event.pos) # click routing
+for element in manager.elements_in(dirty_rect): redraw(element)
+# After changing element rects directly (element.rect.x = ...):
+manager.relayout()
+"""
+import pygame
+import pygame_gui
+
+class GridIndex:
+    """Keys with rects, bucketed by a uniform grid of 'cell_size' pixel cells.
+
+    Behavior
+    --------
+    insert() of a key that is already in the index moves it
+    query_point() and query_rect() return only keys whose rect
+    really contains the point or overlaps the rect
+    Empty rects are stored but never found
+    """
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self._cells = {} # {(col, row): set of keys}
+        self._rects = {} # {key: Rect}
+
+    def __len__(self): return len(self._rects)
+    def __contains__(self, key): return key in self._rects
+
+    def insert(self, key, rect):
+        """Add 'key' at 'rect', or move it there."""
+        rect = pygame.Rect(rect)
+        old = self._rects.get(key)
+        if old == rect: return
+        old_cells = self._cells_of(old) if old is not None else set()
+        new_cells = self._cells_of(rect)
+        for cell in old_cells - new_cells:
+            keys = self._cells[cell]
+            keys.discard(key)
+            if not keys: del self._cells[cell]
+        for cell in new_cells - old_cells:
+            self._cells.setdefault(cell, set()).add(key)
+        self._rects[key] = rect
+
+    def remove(self, key):
+        rect = self._rects.pop(key, None)
+        if rect is None: return
+        for cell in self._cells_of(rect):
+            keys = self._cells[cell]
+            keys.discard(key)
+            if not keys: del self._cells[cell]
+
+    def rect(self, key): return self._rects[key]
+
+    def query_point(self, pos): # -> set
+        """Return keys whose rect contains 'pos'."""
+        x, y = pos
+        keys = self._cells.get((int(x)//self.cell_size, int(y)//self.cell_size), ())
+        return {key for key in keys if self._rects[key].collidepoint(x, y)}
+
+    def query_rect(self, rect): # -> set
+        """Return keys whose rect overlaps 'rect'."""
+        rect = pygame.Rect(rect)
+        found = set()
+        for cell in self._cells_of(rect): found.update(self._cells.get(cell, ()))
+        return {key for key in found if self._rects[key].colliderect(rect)}
+
+    def _cells_of(self, rect): # -> set
+        if rect.width <= 0 or rect.height <= 0: return set()
+        size = self.cell_size
+        return {
+            (col, row)
+            for col in range(rect.left//size, (rect.right - 1)//size + 1)
+            for row in range(rect.top//size, (rect.bottom - 1)//size + 1)
+            }
+
+class _IndexedGroup(pygame.sprite.LayeredUpdates):
+    """Sprite group that tells its manager which elements came and went."""
+    def __init__(self, manager, *sprites):
+        self.manager = manager
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.manager._moved.add(sprite) # no rect yet: UIElement sets it after joining
+        self.manager._track(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.manager._moved.discard(sprite)
+        self.manager.index.remove(sprite)
+
+_pointer_events = (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION)
+
+# UIElement methods that change 'rect'; pygame_gui calls them itself
+# (scroll bar thumbs, dragged windows and their contents)
+_rect_setters = ('set_position', 'set_relative_position', 'set_dimensions',
+                 'update_containing_rect_position')
+
+class IndexedUIManager(pygame_gui.UIManager):
+    """UIManager that hover-checks only the elements under the mouse.
+
+    Behavior
+    --------
+    Elements join the index when made and leave it when killed
+    Clicks and mouse motion go only to elements near the pointer
+    Elements moved or resized by their own methods (set_position,
+    set_relative_position, set_dimensions,
+    update_containing_rect_position) are re-indexed; rects changed
+    directly need 'relayout()' or 'element_moved(element)'
+    Among overlapping elements the highest layer gets the hover,
+    like UIManager
+
+    Parameters
+    ----------
+    window_resolution, theme_path:
+        As for pygame_gui.UIManager.
+    cell_size:
+        Grid cell size in pixels. About the size of a typical
+        element is a good choice.
+    """
+    def __init__(self, window_resolution, theme_path=None, cell_size=64, **kwargs):
+        self.index = GridIndex(cell_size)
+        self._moved = set() # elements to (re)index before the next query
+        self._hovered = set()
+        self._pressed = [] # elements under the last button press: they get the release
+        super().__init__(window_resolution, theme_path, **kwargs)
+
+    @property
+    def ui_group(self): return self._ui_group
+
+    @ui_group.setter
+    def ui_group(self, group):
+        # UIManager.__init__ makes a plain LayeredUpdates: use one that reports to the index
+        self._ui_group = _IndexedGroup(self, *group.sprites())
+
+    def element_moved(self, element):
+        """Re-index 'element' after its rect changed."""
+        if element.alive(): self._moved.add(element)
+
+    def relayout(self):
+        """Re-index every element, e.g. after the layout was recomputed."""
+        self._moved.update(self.ui_group.sprites())
+
+    def element_at(self, pos): # -> UIElement or None
+        """Return the top element under 'pos'."""
+        under = self._under(pos)
+        return under[0] if under else None
+
+    def elements_in(self, rect): # -> list
+        """Return elements overlapping 'rect', e.g. to redraw a dirty rect."""
+        self._index_moved()
+        return list(self.index.query_rect(rect))
+
+    def process_events(self, event):
+        """Same as UIManager.process_events, but pointer events visit only nearby elements.
+
+        Button and motion events go to the elements under the
+        pointer, the focused element and the elements under the last
+        button press (so they see the release). Keyboard, text and
+        wheel events go to every element, as in UIManager.
+        """
+        if event.type not in _pointer_events or not hasattr(event, 'pos'):
+            return super().process_events(event)
+        under = self._under(event.pos)
+        click = event.type == pygame.MOUSEBUTTONDOWN and event.button == 1
+        if click: # pop the window clicked in to the front
+            root = self.ui_window_stack.get_root_window()
+            for window in under:
+                if ('window' in window.element_ids[-1] and window is not root
+                        and window.check_clicked_inside(event)): break
+        others = set(self._pressed)
+        if self.select_focused_element is not None: others.add(self.select_focused_element)
+        others = [element for element in others if element.alive() and element not in under]
+        layer = self.ui_group.get_layer_of_sprite
+        candidates = sorted(under + others, key=layer, reverse=True) # stable: 'under' order kept
+        for element in candidates:
+            if click and element in under and element is not self.select_focused_element:
+                self.unselect_focus_element()
+                self.select_focus_element(element)
+            if element.process_event(event): break
+        if event.type == pygame.MOUSEBUTTONDOWN: self._pressed = under
+        elif event.type == pygame.MOUSEBUTTONUP: self._pressed = []
+
+    def update(self, time_delta):
+        """Same as UIManager.update, but hover is checked only near the mouse."""
+        if self.live_theme_updates:
+            self.theme_update_acc += time_delta
+            if self.theme_update_acc > self.theme_update_check_interval:
+                self.theme_update_acc = 0.0
+                if self.ui_theme.check_need_to_reload():
+                    for sprite in self.ui_group.sprites():
+                        sprite.rebuild_from_changed_theme_data()
+        self.ui_theme.update_shape_cache()
+        self.update_mouse_position()
+        # Elements hovered last time are checked too, so they get unhovered
+        candidates = self._under(self.get_mouse_position())
+        candidates += [element for element in self._hovered if element not in candidates]
+        hover_handled = False
+        for element in candidates:
+            if element.check_hover(time_delta, hover_handled): hover_handled = True
+        self._hovered = {element for element in candidates if element.hovered}
+        self.ui_group.update(time_delta)
+
+    def _under(self, pos): # -> list
+        """Elements containing 'pos', top layer first."""
+        self._index_moved()
+        layer = self.ui_group.get_layer_of_sprite
+        return sorted(self.index.query_point(pos), key=layer, reverse=True)
+
+    def _track(self, element):
+        """Wrap the rect setters of 'element' so they re-index it."""
+        if element.__dict__.get('_indexed_by') is self: return # pooled element back again
+        element._indexed_by = self
+        for name in _rect_setters:
+            setter = getattr(type(element), name, None)
+            if setter is None: continue
+            def moved(*args, setter=setter, **kwargs):
+                result = setter(element, *args, **kwargs)
+                self.element_moved(element)
+                return result
+            setattr(element, name, moved)
+
+    def _index_moved(self):
+        for element in self._moved: self.index.insert(element, element.rect)
+        self._moved.clear()
@@ -0,0 +1,198 @@
+"""Count UI elements and surface memory: ':stats ui'.
+
+Use this to find elements and surfaces that pile up in long sessions,
+e.g., after many fullscreen toggles (every toggle kills and makes the
+command line again, see 'resize_cmdline').
+
+COLON commands
+--------------
+:stats ui
+    Live elements per type per manager, bytes of surfaces held by
+    elements and theme caches, elements created and killed per
+    second since the last ':stats ui'. Starts counting creations
+    and kills.
+:stats ui stop
+    Stop counting: element creation and kill are no longer wrapped.
+:stats text
+    Rendered-text cache size, hits, misses and evictions.
+:stats mark name
+    Save a tracemalloc snapshot called 'name'.
+    Starts tracemalloc the first time, which slows allocation
+    down. Mark at the start of a session, not in the middle.
+:stats diff first second
+    Show the source lines whose allocations grew the most
+    between two marks.
+
+Example
+-------
+import makeuppy as mukpy
+mukpy.ui_stats.start() # count creations and kills from now on
+# ...hours later...
+print(mukpy.ui_stats.report())
+mukpy.ui_stats.stop() # elements no longer pay for the counting
+# Or count only while a block runs:
+with mukpy.UiStats() as stats:
+    rebuild_layout()
+print(stats.created, stats.killed)
+"""
+import pygame
+import pygame_gui
+import time
+import tracemalloc # memory diff between two marks
+from collections import Counter
+from . import makeuppy as _mukpy
+
+class UiStats:
+    """Count pygame_gui element creations and kills, and memory in use.
+
+    Behavior
+    --------
+    start() wraps UIElement.__init__ and UIElement.kill to count
+    every element made or killed, by any code
+    Calling start() again does nothing; stop() puts UIElement back
+    as it was
+    As a context manager, counts while the block runs
+    counts() and surface_bytes() work without start()
+    """
+    def __init__(self):
+        self.started = False
+        self.created = 0
+        self.killed = 0
+        self.marks = {}
+        self._last_rates = (time.perf_counter(), 0, 0)
+        self._originals = None # UIElement (__init__, kill) while started
+
+    def start(self):
+        """Start counting element creations and kills."""
+        if self.started: return
+        self.started = True
+        self._last_rates = (time.perf_counter(), self.created, self.killed)
+        element = pygame_gui.core.UIElement
+        init, kill = element.__init__, element.kill
+        self._originals = (init, kill)
+        stats = self
+        def counted_init(self, *args, **kwargs):
+            init(self, *args, **kwargs)
+            stats.created += 1
+            _mukpy.current_app().ui_managers.add(self.ui_manager)
+        def counted_kill(self):
+            if self.alive(): stats.killed += 1 # kill() twice counts once
+            kill(self)
+        element.__init__ = counted_init
+        element.kill = counted_kill
+
+    def stop(self):
+        """Stop counting. UIElement.__init__ and kill are put back."""
+        if not self.started: return
+        element = pygame_gui.core.UIElement
+        element.__init__, element.kill = self._originals
+        self._originals = None
+        self.started = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info): self.stop()
+
+    def counts(self): # -> dict
+        """Return {manager_name: Counter({element_type: live_count})}."""
+        return {
+            _manager_name(manager): Counter(
+                type(element).__name__ for element in manager.get_sprite_group()
+                )
+            for manager in _mukpy.get_ui_managers()
+            }
+
+    def surface_bytes(self): # -> int
+        """Return bytes of pixel memory held by elements and theme shape caches."""
+        total = 0
+        for manager in _mukpy.get_ui_managers():
+            for element in manager.get_sprite_group():
+                total += _bytes(getattr(element, 'image', None))
+            # pygame_gui internals: may not exist in other versions
+            cache = getattr(manager.get_theme(), 'shape_cache', None)
+            if cache is None: continue
+            for item in getattr(cache, 'cache_surfaces', []):
+                total += _bytes(_cached_surface(item))
+            for item in getattr(cache, 'cache_short_term_lookup', {}).values():
+                total += _bytes(_cached_surface(item))
+        return total
+
+    def rates(self): # -> (created_per_s, killed_per_s)
+        """Return creations and kills per second since the last call."""
+        now = time.perf_counter()
+        then, created, killed = self._last_rates
+        self._last_rates = (now, self.created, self.killed)
+        elapsed = max(now - then, 1e-9)
+        return (self.created - created)/elapsed, (self.killed - killed)/elapsed
+
+    def report(self): # -> dict
+        """Return counts, surface bytes and rates in one dict."""
+        created_per_s, killed_per_s = self.rates()
+        return {
+            'elements': self.counts(),
+            'surface_bytes': self.surface_bytes(),
+            'created': self.created,
+            'killed': self.killed,
+            'created_per_s': created_per_s,
+            'killed_per_s': killed_per_s,
+            }
+
+    def mark(self, name):
+        """Save a tracemalloc snapshot as 'name'. Starts tracemalloc if needed."""
+        if not tracemalloc.is_tracing(): tracemalloc.start()
+        self.marks[name] = tracemalloc.take_snapshot()
+
+    def diff(self, first, second, limit=10): # -> list
+        """Return the 'limit' source lines that grew most from mark 'first' to 'second'."""
+        stats = self.marks[second].compare_to(self.marks[first], 'lineno')
+        return [str(stat) for stat in stats[:limit]]
+
+def _manager_name(manager): return f'{type(manager).__name__}@{id(manager):x}'
+
+def _cached_surface(item):
+    """SurfaceCache entries are a Surface, or hold one (pygame_gui 0.5)."""
+    if isinstance(item, pygame.Surface): return item
+    if isinstance(item, dict): return item.get('surface')
+    return item[0]
+
+def _bytes(surface):
+    if surface is None: return 0
+    return surface.get_pitch()*surface.get_height()
+
+# ---Default stats used by ':stats'---
+ui_stats = UiStats()
+
+def _stats(args):
+    words = args.split()
+    if words == ['ui', 'stop']:
+        ui_stats.stop()
+        return "OK: stopped counting element creations and kills"
+    if words == ['ui']:
+        ui_stats.start()
+        report = ui_stats.report()
+        managers = '; '.join(
+            f"{name}: " + ', '.join(f"{kind} {n}" for kind, n in sorted(counts.items()))
+            for name, counts in report['elements'].items()
+            )
+        return (f"OK: {managers or 'no managers'} | "
+                f"{report['surface_bytes']/2**20:.1f} MB surfaces | "
+                f"{report['created_per_s']:.1f} created/s, "
+                f"{report['killed_per_s']:.1f} killed/s")
+    if words[:1] == ['text']:
+        cache = _mukpy.current_app().text_cache.stats()
+        return (f"OK: {cache['surfaces']} text surfaces, "
+                f"{cache['bytes']/2**20:.1f} of {cache['max_bytes']/2**20:.1f} MB | "
+                f"{cache['hits']} hits, {cache['misses']} misses ({100*cache['hit_rate']:.0f}%), "
+                f"{cache['evictions']} evicted")
+    if words[:1] == ['mark'] and len(words) == 2:
+        ui_stats.mark(words[1])
+        return f"OK: marked '{words[1]}'"
+    if words[:1] == ['diff'] and len(words) == 3:
+        missing = [name for name in words[1:] if name not in ui_stats.marks]
+        if missing: return f"ERROR: no mark '{missing[0]}'"
+        return f"OK: {'; '.join(ui_stats.diff(words[1], words[2], limit=3))}"
+    return f"ERROR: expected ':stats ui [stop]', ':stats text', ':stats mark name' or ':stats diff first second'"
+
+_mukpy.register_command('stats', _stats, 'UI, text cache and memory stats: :stats ui [stop]|text|mark|diff')
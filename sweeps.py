@@ -0,0 +1,184 @@
+"""Record sweeps to a memory-mapped '.npy' file and open them without copying.
+
+A recording is two '.npy' files:
+    run1.npy                one row per sweep: ('time', 'counts')
+    run1-wavelengths.npy    the wavelength axis, shared by every sweep
+
+Both are ordinary '.npy' files. 'numpy.load' opens them.
+
+Example
+-------
+import makeuppy as mukpy
+recorder = mukpy.SweepRecorder('run1.npy', wavelengths)
+# ...every time a sweep finishes...
+recorder.append(counts) # returns immediately
+# ...end of session...
+recorder.close()
+
+# Later, or in another process, or at the command line:
+# :eval(mukpy.open_recording('run1.npy').counts.mean(axis=0))
+run1 = mukpy.open_recording('run1.npy')
+run1.counts[-1] # last sweep, read straight from the file
+"""
+import numpy as np
+import threading # writer thread does the file I/O off the UI thread
+import queue
+import os
+import time
+from collections import namedtuple
+
+Recording = namedtuple('Recording', [ 'wavelengths', 'time', 'counts' ])
+'''Sweeps returned by 'open_recording()'.
+
+wavelengths: 1D array, length n
+time: 1D array of sweep timestamps, seconds since the epoch
+counts: 2D array, one row of n counts per sweep
+'''
+
+class SweepRecorder:
+    """Append fixed-shape sweeps to a '.npy' file from a background thread.
+
+    Behavior
+    --------
+    append() copies the sweep and returns without touching the file
+    The file is preallocated and doubles in size when it is full
+    The '.npy' header is updated every 'flush_every' sweeps, so a
+    reader (or a crash) sees every sweep up to the last flush
+    close() writes pending sweeps and trims unused rows off the file
+
+    Parameters
+    ----------
+    path:
+        type: str
+        Name of the '.npy' file. Overwritten if it exists.
+    wavelengths:
+        1D array-like. Every sweep has one count per wavelength.
+    dtype:
+        Data type of the counts.
+    capacity:
+        type: int
+        Number of sweeps to preallocate room for.
+    flush_every:
+        type: int
+        Number of sweeps between header updates.
+    """
+    def __init__(self, path, wavelengths, dtype='f8', capacity=1024, flush_every=16):
+        self.path = path
+        self.wavelengths = np.array(wavelengths)
+        if self.wavelengths.ndim != 1:
+            raise ValueError(f"wavelengths must be 1D, not shape {self.wavelengths.shape}")
+        self.dtype = np.dtype([
+            ('time', 'f8'),
+            ('counts', dtype, (len(self.wavelengths),)),
+            ])
+        self.flush_every = flush_every
+        self.count = 0 # sweeps written to the file by the writer thread
+        np.save(wavelengths_path(path), self.wavelengths)
+        self._file = open(path, 'w+b')
+        self._capacity = 0
+        self._rows = None
+        self._grow(max(1, capacity))
+        self._write_header()
+        self._pending = queue.Queue()
+        self._writer = threading.Thread(target=self._write_sweeps, daemon=True)
+        self._writer.start()
+
+    def append(self, counts, timestamp=None):
+        """Queue one sweep for writing. 'timestamp' defaults to now."""
+        if self._file is None: raise ValueError(f"{self.path} is closed")
+        sweep = np.empty((), dtype=self.dtype)
+        sweep['time'] = time.time() if timestamp is None else timestamp
+        sweep['counts'] = counts # copy: application may reuse its buffer
+        self._pending.put(sweep)
+
+    def close(self):
+        """Write pending sweeps, update the header and close the file."""
+        if self._file is None: return
+        self._pending.put(None)
+        self._writer.join()
+        self._rows.flush()
+        self._rows = None # unmap before resizing the file
+        self._write_header()
+        self._file.truncate(_HEADER_LEN + self.count*self.dtype.itemsize)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self): return self
+    def __exit__(self, *exc_info): self.close()
+
+    def _write_sweeps(self):
+        """Writer thread: copy queued sweeps into the memory map."""
+        while True:
+            sweep = self._pending.get()
+            if sweep is None: break
+            if self.count == self._capacity: self._grow(2*self._capacity)
+            self._rows[self.count] = sweep
+            self.count += 1
+            if self.count % self.flush_every == 0:
+                self._rows.flush()
+                self._write_header()
+
+    def _grow(self, capacity):
+        """Extend the file to hold 'capacity' sweeps and map it again."""
+        if self._rows is not None: self._rows.flush()
+        self._rows = None
+        # Extending with truncate is instant: new rows are not written yet.
+        self._file.truncate(_HEADER_LEN + capacity*self.dtype.itemsize)
+        self._capacity = capacity
+        self._rows = np.memmap(
+            self._file, dtype=self.dtype, mode='r+',
+            offset=_HEADER_LEN, shape=(capacity,)
+            )
+
+    def _write_header(self):
+        """Header shape is the number of sweeps written, not the capacity."""
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, self.count))
+        self._file.flush()
+
+def open_recording(path, mode='r'): # -> Recording
+    """Return the sweeps in 'path' as a Recording of memory-mapped arrays.
+
+    Opening is instant for any size of file: nothing is read until
+    the arrays are indexed. The arrays are views of the file, not
+    copies.
+
+    Open a file that is still recording to see every sweep up to
+    the recorder's last header update.
+
+    Parameters
+    ----------
+    path:
+        type: str
+        '.npy' file written by SweepRecorder
+    mode:
+        'r' read-only, 'r+' to edit the file in place
+    """
+    sweeps = np.load(path, mmap_mode=mode)
+    wavelengths = np.load(wavelengths_path(path), mmap_mode=mode)
+    return Recording(wavelengths=wavelengths, time=sweeps['time'], counts=sweeps['counts'])
+
+def wavelengths_path(path): # -> str
+    """Return the name of the wavelength-axis file that goes with 'path'."""
+    stem, ext = os.path.splitext(path)
+    return f'{stem}-wavelengths{ext or ".npy"}'
+
+# Fixed header size so the shape can be rewritten in place as the file grows.
+_HEADER_LEN = 256
+
+def _npy_header(dtype, rows): # -> bytes
+    """Return a '.npy' version 1.0 header padded to _HEADER_LEN bytes.
+
+    Format: https://numpy.org/doc/stable/reference/generated/numpy.lib.format.html
+    """
+    header = repr({
+        'descr': np.lib.format.dtype_to_descr(dtype),
+        'fortran_order': False,
+        'shape': (rows,),
+        })
+    prefix = np.lib.format.MAGIC_PREFIX + bytes([1, 0])
+    header_len = _HEADER_LEN - len(prefix) - 2 # 2 bytes store header_len
+    header = header.ljust(header_len - 1) + '\n'
+    if len(header) > header_len:
+        raise ValueError(f"dtype is too complicated for a {_HEADER_LEN} byte header")
+    return prefix + header_len.to_bytes(2, 'little') + header.encode('latin1')
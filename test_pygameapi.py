@@ -14,23 +14,28 @@ import pygame
 from collections import namedtuple
 # use numpy to fake pygame function return values
 import numpy as np
+# recorded frames are saved in a temporary folder
+import os
+import json
+import time
+# remote control tests need Unix sockets
+import socket
 
 class set_dev_mode(unittest.TestCase):
     def setUp(self):
         """Restore default state of pygameapi.
-        
+
         Context
         -------
-        pygameapi contains the line:
-        DEV = False
+        Dev mode belongs to the current App ('default_app').
+        pgui.DEV reads and writes it.
 
         Intent
         ------
-        Reset DEV between tests.
-        DEV is global.
-        Call set_dev_mode(True) changes DEV to True.
+        Reset dev mode between tests.
+        Call set_dev_mode(True) changes pgui.DEV to True.
         """
-        pgui.DEV=False
+        pgui.set_dev_mode(False)
 
     def test_pgui_DOT_DEV_is_False_if_dev_UNDERSCORE_mode_is_not_called(self):
         """This test is only for generating the docstring.
@@ -46,6 +51,16 @@ class set_dev_mode(unittest.TestCase):
         """
         self.assertFalse(pgui.DEV)
 
+    def test_Assigning_pgui_DOT_DEV_changes_dev_mode(self):
+        pgui.DEV = True
+        self.assertTrue(pgui.get_dev_mode())
+        pgui.set_dev_mode(False)
+        self.assertFalse(pgui.DEV)
+        pgui.CMD = True
+        self.assertTrue(pgui.get_cmd_mode())
+        pgui.CMD = False
+        self.assertNotIn('DEV', vars(pgui)) # no stale attribute shadows the App
+
     def test_pgui_DOT_DEV_is_True_if_dev_UNDERSCORE_mode_is_called_with_True(self):
         pgui.set_dev_mode(True)
         self.assertTrue(pgui.get_dev_mode())
@@ -235,6 +250,1032 @@ class window_size(unittest.TestCase):
         # =====[ Operate ]=====
         self.assertEqual( pgui.window_size(win), (nc,nr) )
 
+def keep_commands(test):
+    """Drop commands 'test' registers or declares once it is done.
+
+    The command registry is module-global: leftovers would show up in
+    ':help' and 'complete_command' of later tests.
+    """
+    import pygameapi.makeuppy
+    for registry in (pygameapi.makeuppy._commands, pygameapi.makeuppy._declared):
+        saved = dict(registry)
+        test.addCleanup(registry.update, saved)
+        test.addCleanup(registry.clear)
+
 class evaluate(unittest.TestCase):
+    def setUp(self):
+        keep_commands(self)
+
     def test_need_to_write_some(self):
         pass
+
+    def test_Returns_None_if_command_is_not_registered(self):
+        self.assertIsNone(pgui.evaluate(':not_a_registered_command'))
+
+    def test_Returns_response_of_registered_command(self):
+        pgui.register_command('hello', lambda args: f"OK: hello {args}")
+        self.assertEqual(pgui.evaluate(':hello world'), 'OK: hello world')
+
+    def test_Returns_ERROR_if_registered_command_raises(self):
+        pgui.register_command('oops', lambda args: 1/0)
+        self.assertTrue(pgui.evaluate(':oops').startswith('ERROR'))
+
+class declare_command(unittest.TestCase):
+    def setUp(self):
+        import tempfile, sys
+        keep_commands(self)
+        self.tmp = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmp.name, 'lazy_cmd_module.py'), 'w') as f:
+            f.write("def shout(args): return 'OK: ' + args.upper()\n")
+        with open(os.path.join(self.tmp.name, 'commands.json'), 'w') as f:
+            f.write('{"shout": {"module": "lazy_cmd_module", "function": "shout",'
+                    ' "help": "Repeat args in capitals"}}')
+        sys.path.insert(0, self.tmp.name)
+        sys.modules.pop('lazy_cmd_module', None)
+
+    def tearDown(self):
+        import sys
+        sys.path.remove(self.tmp.name)
+        self.tmp.cleanup()
+
+    def test_Module_is_not_imported_until_command_is_evaluated(self):
+        import sys
+        pgui.load_command_manifest(os.path.join(self.tmp.name, 'commands.json'))
+        self.assertNotIn('lazy_cmd_module', sys.modules)
+        self.assertEqual(pgui.evaluate(':shout hi'), 'OK: HI')
+        self.assertIn('lazy_cmd_module', sys.modules)
+
+    def test_help_and_completion_work_before_import(self):
+        import sys
+        pgui.load_command_manifest(os.path.join(self.tmp.name, 'commands.json'))
+        self.assertIn('shout', pgui.complete_command(':sh'))
+        self.assertEqual(pgui.evaluate(':help shout'), 'OK: :shout -- Repeat args in capitals')
+        self.assertNotIn('lazy_cmd_module', sys.modules)
+
+    def test_prewarm_commands_imports_declared_modules(self):
+        import sys
+        pgui.load_command_manifest(os.path.join(self.tmp.name, 'commands.json'))
+        pgui.prewarm_commands().join()
+        self.assertIn('lazy_cmd_module', sys.modules)
+
+class FrameRecorder(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.surface = pygame.Surface((16,8), depth=32)
+        self.surface.fill((10,157,255))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_Writes_one_file_per_captured_frame(self):
+        rec = pgui.FrameRecorder(out_dir=self.tmp.name, fmt='raw')
+        rec.start()
+        for _ in range(3): rec.capture(self.surface)
+        path = rec.stop()
+        self.assertEqual(rec.written + rec.dropped, 3)
+        self.assertEqual(len(os.listdir(path)), rec.written)
+
+    def test_Raw_frames_hold_the_surface_RGB_values(self):
+        rec = pgui.FrameRecorder(out_dir=self.tmp.name, fmt='raw')
+        rec.start()
+        rec.capture(self.surface)
+        path = rec.stop()
+        frame = np.load(os.path.join(path, 'frame_000001.npy'))
+        self.assertEqual(frame.shape, (8,16,3))
+        self.assertEqual(tuple(frame[0,0]), (10,157,255))
+
+    def test_Drops_frames_instead_of_blocking_when_buffers_are_full(self):
+        rec = pgui.FrameRecorder(out_dir=self.tmp.name, fmt='raw', max_pending=1)
+        rec.start()
+        for _ in range(50): rec.capture(self.surface)
+        rec.stop()
+        self.assertEqual(rec.written + rec.dropped, 50)
+
+    def test_Writer_errors_are_reported_and_stop_does_not_block(self):
+        import pygameapi.capture
+        def disk_full(*args): raise OSError('No space left on device')
+        write_frame = pygameapi.capture._write_frame
+        pygameapi.capture._write_frame = disk_full
+        self.addCleanup(setattr, pygameapi.capture, '_write_frame', write_frame)
+        rec = pgui.FrameRecorder(out_dir=self.tmp.name, fmt='raw', max_pending=2)
+        rec.start()
+        for _ in range(20): rec.capture(self.surface)
+        rec.stop() # returns: writer kept draining
+        self.assertEqual(rec.written, 0)
+        self.assertEqual(rec.failed + rec.dropped, 20)
+        self.assertIn('No space left on device', rec.status())
+
+    def test_Does_nothing_if_not_started(self):
+        rec = pgui.FrameRecorder(out_dir=self.tmp.name)
+        rec.capture(self.surface)
+        self.assertEqual(rec.captured, 0)
+
+class SweepRecorder(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'run1.npy')
+        self.wavelengths = np.linspace(400, 700, 32)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_Grows_file_past_preallocated_capacity(self):
+        with pgui.SweepRecorder(self.path, self.wavelengths, capacity=2) as recorder:
+            for i in range(5): recorder.append(np.full(32, i))
+        self.assertEqual(pgui.open_recording(self.path).counts.shape, (5,32))
+
+    def test_open_recording_returns_sweeps_in_order_with_wavelengths(self):
+        with pgui.SweepRecorder(self.path, self.wavelengths, dtype='u2') as recorder:
+            for i in range(3): recorder.append(np.arange(32)+i, timestamp=i)
+        run1 = pgui.open_recording(self.path)
+        np.testing.assert_array_equal(run1.wavelengths, self.wavelengths)
+        np.testing.assert_array_equal(run1.time, [0,1,2])
+        np.testing.assert_array_equal(run1.counts[:,0], [0,1,2])
+
+    def test_Recording_is_a_standard_npy_file(self):
+        with pgui.SweepRecorder(self.path, self.wavelengths) as recorder:
+            recorder.append(np.ones(32))
+        self.assertEqual(np.load(self.path).shape, (1,))
+
+class MinMaxPyramid(unittest.TestCase):
+    def setUp(self):
+        self.data = np.random.default_rng(0).normal(size=10000)
+
+    def test_Incremental_updates_match_building_all_at_once(self):
+        incremental = pgui.MinMaxPyramid()
+        for stop in (1, 37, 4096, 5001, 10000): incremental.update(self.data[:stop])
+        at_once = pgui.MinMaxPyramid()
+        at_once.update(self.data)
+        self.assertEqual(len(incremental.levels), len(at_once.levels))
+        for a, b in zip(incremental.levels, at_once.levels):
+            np.testing.assert_array_equal(a, b)
+
+    def test_view_returns_min_and_max_of_the_window(self):
+        pyramid = pgui.MinMaxPyramid()
+        pyramid.update(self.data)
+        x, mins, maxs = pyramid.view(self.data, 0, 10000, width=100)
+        self.assertLessEqual(len(x), 100*pyramid.factor)
+        self.assertEqual(mins.min(), self.data.min())
+        self.assertEqual(maxs.max(), self.data.max())
+
+    def test_open_continues_a_saved_pyramid(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'run1.npy')
+            saved = pgui.MinMaxPyramid()
+            saved.update(self.data[:6000])
+            saved.save(path)
+            reopened = pgui.MinMaxPyramid.open(path)
+            reopened.update(self.data)
+            at_once = pgui.MinMaxPyramid()
+            at_once.update(self.data)
+            for a, b in zip(reopened.levels, at_once.levels):
+                np.testing.assert_array_equal(a, b)
+
+class UiStats(unittest.TestCase):
+    def setUp(self):
+        import pygame_gui
+        pygame.init()
+        pygame.display.set_mode((64,64))
+        self.manager = pygame_gui.UIManager((64,64))
+        self.stats = pgui.ui_stats
+        self.stats.start()
+        self.addCleanup(self.stats.stop)
+
+    def make_button(self):
+        import pygame_gui
+        return pygame_gui.elements.UIButton(
+            pygame.Rect(0,0,32,16), 'ok', manager=self.manager)
+
+    def test_Counts_created_and_killed_elements(self):
+        created, killed = self.stats.created, self.stats.killed
+        button = self.make_button()
+        button.kill()
+        button.kill()
+        self.assertEqual(self.stats.created - created, 1)
+        self.assertEqual(self.stats.killed - killed, 1)
+
+    def test_Counts_live_elements_per_type_per_manager(self):
+        self.make_button(); self.make_button()
+        counts = [c for c in self.stats.counts().values() if c['UIButton'] == 2]
+        self.assertEqual(len(counts), 1)
+
+    def test_surface_bytes_includes_element_images(self):
+        before = self.stats.surface_bytes()
+        self.make_button()
+        self.assertGreater(self.stats.surface_bytes(), before)
+
+    def test_Stop_puts_UIElement_back(self):
+        import pygame_gui
+        self.stats.stop()
+        element = pygame_gui.core.UIElement
+        init, kill = element.__init__, element.kill
+        with pgui.UiStats() as stats:
+            stats.start() # twice: no second wrapper
+            self.make_button().kill()
+        self.make_button().kill()
+        self.assertEqual((stats.created, stats.killed), (1, 1))
+        self.assertIs(element.__init__, init)
+        self.assertIs(element.kill, kill)
+
+class SweepSlots(unittest.TestCase):
+    def setUp(self):
+        from multiprocessing import shared_memory
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=pgui.SweepSlots.nbytes(n_slots=2, n_pixels=4))
+        self.slots = pgui.SweepSlots(self.shm, n_slots=2, n_pixels=4)
+        self.slots.reset()
+
+    def tearDown(self):
+        self.slots = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def test_latest_returns_None_before_first_commit(self):
+        self.assertEqual(self.slots.latest(), (None, None))
+
+    def test_latest_returns_newest_sweep_as_a_view(self):
+        self.slots.publish([1,1,1,1])
+        self.slots.publish([2,2,2,2])
+        seq, counts = self.slots.latest()
+        self.assertEqual(seq, 1)
+        np.testing.assert_array_equal(counts, [2,2,2,2])
+        self.assertTrue(np.shares_memory(counts, self.slots.counts))
+
+    def test_valid_is_False_after_slot_is_reused(self):
+        seq = self.slots.publish([1,1,1,1])
+        self.slots.publish([2,2,2,2])
+        self.assertTrue(self.slots.valid(seq))
+        self.slots.publish([3,3,3,3])
+        self.assertFalse(self.slots.valid(seq))
+
+def _echo_worker(link):
+    """AcquisitionProcess worker for tests: publish one sweep per command."""
+    def sweep(args):
+        link.slots.publish(np.full(4, float(args)))
+        return f"OK: {args}"
+    link.commands['sweep'] = sweep
+    while link.poll(0.01): pass
+
+class AcquisitionProcess(unittest.TestCase):
+    def test_Child_answers_commands_and_shares_sweeps(self):
+        acq = pgui.AcquisitionProcess(_echo_worker, n_pixels=4)
+        acq.start()
+        try:
+            self.assertEqual(acq.send('sweep', '7'), 'OK: 7')
+            seq, counts = acq.slots.latest()
+            np.testing.assert_array_equal(counts, [7,7,7,7])
+            del counts
+        finally:
+            acq.stop()
+
+    def test_Stop_while_the_GUI_holds_a_view(self):
+        acq = pgui.AcquisitionProcess(_echo_worker, n_pixels=4)
+        acq.start()
+        try: self.assertEqual(acq.send('sweep', '3'), 'OK: 3')
+        except BaseException:
+            acq.stop()
+            raise
+        seq, counts = acq.slots.latest() # a plot keeps its last frame
+        acq.stop()
+        np.testing.assert_array_equal(counts, [3,3,3,3])
+        self.assertIsNone(acq.slots)
+
+class RemoteServer(unittest.TestCase):
+    def setUp(self):
+        import threading
+        self.server = pgui.RemoteServer(handler=lambda cmd: f"OK: {cmd}" if cmd != ':nope' else None)
+        self.server.start()
+        # Fake the application frame loop
+        self.running = True
+        def frames():
+            while self.running: self.server.process()
+        self.frames = threading.Thread(target=frames)
+        self.frames.start()
+
+    def tearDown(self):
+        self.running = False
+        self.frames.join()
+        self.server.stop()
+
+    def test_Returns_responses_in_command_order(self):
+        with pgui.RemoteClient(self.server.address) as client:
+            self.assertEqual(client.run(':a', ':nope', ':b'), ['OK: :a', None, 'OK: :b'])
+
+    def test_Pipelined_batches_are_answered_in_order(self):
+        batches = [[f':{i}'] for i in range(200)]
+        with pgui.RemoteClient(self.server.address) as client:
+            responses = client.run_many(batches)
+        self.assertEqual(responses, [[f'OK: :{i}'] for i in range(200)])
+
+    def test_Start_raises_if_the_port_is_in_use(self):
+        with socket.socket() as taken:
+            taken.bind(('127.0.0.1', 0))
+            taken.listen()
+            server = pgui.RemoteServer(address=taken.getsockname())
+            with self.assertRaises(OSError): server.start() # does not hang
+
+    def test_Commands_must_be_a_list(self):
+        with pgui.RemoteClient(self.server.address) as client:
+            client._socket.sendall(b'{"id": 1, "commands": ":abc"}\n')
+            with self.assertRaisesRegex(ValueError, "must be a list"): client._receive()
+            self.assertEqual(client.run(':a'), ['OK: :a']) # connection still usable
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets only')
+    def test_Running_server_socket_is_not_taken_over(self):
+        second = pgui.RemoteServer(address=self.server.address)
+        with self.assertRaises(OSError): second.start()
+        with pgui.RemoteClient(self.server.address) as client:
+            self.assertEqual(client.run(':a'), ['OK: :a'])
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets only')
+    def test_Stale_socket_is_replaced(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'stale.sock')
+            with socket.socket(socket.AF_UNIX) as dead: dead.bind(path) # never listened
+            server = pgui.RemoteServer(address=path, handler=lambda cmd: 'OK')
+            server.start()
+            server.stop()
+
+class Offscreen(unittest.TestCase):
+    def setUp(self):
+        # theme=None: pygame_gui default theme, no font files needed
+        self.gui = pgui.Offscreen(cols=64, rows=48, theme=None, background=(10,157,255))
+
+    def test_render_returns_rows_by_cols_by_RGB(self):
+        frame = self.gui.render()
+        self.assertEqual(frame.shape, (48,64,3))
+        self.assertEqual(tuple(frame[0,0]), (10,157,255))
+
+    def test_render_returns_a_view_of_the_surface(self):
+        frame = self.gui.render()
+        frame[0,0] = (255,44,75)
+        del frame
+        self.assertEqual(tuple(self.gui.surface.get_at((0,0)))[:3], (255,44,75))
+
+    def test_Instances_do_not_share_surfaces(self):
+        other = pgui.Offscreen(cols=64, rows=48, theme=None, background=(0,0,0))
+        frame, other_frame = self.gui.render(), other.render()
+        self.assertNotEqual(tuple(frame[0,0]), tuple(other_frame[0,0]))
+
+class Scheduler(unittest.TestCase):
+    def setUp(self):
+        # Fake clock: tests set self.now
+        self.now = 0.0
+        self.scheduler = pgui.Scheduler(clock=lambda: self.now)
+        self.calls = []
+
+    def test_Runs_due_timers_in_deadline_order(self):
+        self.scheduler.call_later(2, self.calls.append, 'b')
+        self.scheduler.call_later(1, self.calls.append, 'a')
+        self.scheduler.call_later(5, self.calls.append, 'c')
+        self.now = 3
+        self.assertEqual(self.scheduler.run_due(), 2)
+        self.assertEqual(self.calls, ['a','b'])
+
+    def test_Repeating_timer_that_fell_behind_runs_once(self):
+        self.scheduler.call_every(1, self.calls.append, 'tick')
+        self.now = 3.5
+        self.scheduler.run_due()
+        self.assertEqual(self.calls, ['tick'])
+        self.assertEqual(self.scheduler.next_deadline(), 4)
+
+    def test_Cancelled_timer_does_not_run(self):
+        timer = self.scheduler.call_later(1, self.calls.append, 'x')
+        timer.cancel()
+        self.now = 2
+        self.scheduler.run_due()
+        self.assertEqual(self.calls, [])
+        self.assertIsNone(self.scheduler.next_deadline())
+
+    def test_Timer_added_by_a_callback_waits_for_the_next_call(self):
+        def again():
+            self.calls.append('again')
+            self.scheduler.call_later(0, again) # would spin inside one run_due()
+        self.scheduler.call_later(0, again)
+        self.assertEqual(self.scheduler.run_due(), 1)
+        self.assertEqual(self.scheduler.run_due(), 1)
+        self.assertEqual(self.calls, ['again']*2)
+        self.assertEqual(self.scheduler.next_deadline(), 0) # still pending
+
+    def test_timeout_ms_is_time_until_next_deadline(self):
+        self.scheduler.call_later(0.25, self.calls.append, 'x')
+        self.assertEqual(self.scheduler.timeout_ms(), 250)
+        self.assertEqual(self.scheduler.timeout_ms(max_wait_ms=100), 100)
+        self.now = 1
+        self.assertEqual(self.scheduler.timeout_ms(), 1)
+
+class Waterfall(unittest.TestCase):
+    def setUp(self):
+        self.waterfall = pgui.Waterfall(pygame.Rect(0,0,8,3), vmin=0, vmax=100)
+        self.display = pygame.Surface((8,3), depth=32)
+        self.lut = pgui.badwolf_lut()
+
+    def colors_down_the_left_edge(self):
+        self.waterfall.draw(self.display)
+        return [tuple(self.display.get_at((0,row)))[:3] for row in range(3)]
+
+    def test_Newest_row_is_drawn_on_top(self):
+        self.waterfall.add_row(np.full(8, 0))
+        self.waterfall.add_row(np.full(8, 100))
+        colors = self.colors_down_the_left_edge()
+        self.assertEqual(colors[0], tuple(self.lut[-1]))
+        self.assertEqual(colors[1], tuple(self.lut[0]))
+
+    def test_Oldest_row_scrolls_off_the_bottom(self):
+        for value in (100, 0, 0, 0): self.waterfall.add_row(np.full(8, value))
+        self.assertNotIn(tuple(self.lut[-1]), self.colors_down_the_left_edge())
+
+    def test_Sweeps_are_resampled_to_the_rect_width(self):
+        self.waterfall.add_row(np.linspace(0, 100, 2048))
+        self.assertEqual(self.waterfall.rows[self.waterfall.head, 0], 0)
+        self.assertEqual(self.waterfall.rows[self.waterfall.head, -1], len(self.lut) - 1)
+
+    def test_Unsigned_counts_below_vmin_get_the_first_colour(self):
+        waterfall = pgui.Waterfall(pygame.Rect(0,0,4,3), vmin=10, vmax=100)
+        waterfall.add_row(np.array([5, 5, 50, 200], dtype=np.uint16))
+        self.assertEqual(list(waterfall.rows[waterfall.head]), [0, 0, 113, 255])
+        waterfall = pgui.Waterfall(pygame.Rect(0,0,4,3), vmin=-10, vmax=100)
+        waterfall.add_row(np.array([0, 0, 0, 0], dtype=np.uint16)) # no OverflowError
+        self.assertEqual(waterfall.rows[waterfall.head, 0], 23)
+
+class TextCache(unittest.TestCase):
+    def setUp(self):
+        pygame.font.init()
+        self.font = pygame.font.Font(None, 18)
+        self.cache = pgui.TextCache()
+
+    def test_Same_text_returns_the_same_Surface(self):
+        first = self.cache.render(self.font, '532.1 nm', True, (200,100,50))
+        again = self.cache.render(self.font, '532.1 nm', True, pygame.Color(200,100,50))
+        self.assertIs(first, again)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_Least_recently_used_Surface_is_evicted_over_budget(self):
+        first = self.cache.render(self.font, 'first', True, (200,100,50))
+        self.cache.render(self.font, 'the second label', True, (200,100,50))
+        self.cache.max_bytes = self.cache.bytes # 'third' only fits in place of 'second'
+        self.cache.render(self.font, 'first', True, (200,100,50))
+        self.cache.render(self.font, 'third', True, (200,100,50))
+        self.assertEqual(self.cache.evictions, 1) # 'second'
+        self.assertIs(self.cache.render(self.font, 'first', True, (200,100,50)), first)
+
+    def test_UI_manager_fonts_render_through_the_cache(self):
+        import pygame_gui
+        manager = pygame_gui.UIManager((64,64))
+        pgui.use_text_cache(manager, self.cache)
+        font = manager.get_theme().get_font_dictionary().find_font(14, 'fira_code')
+        font.render('OK', True, (200,100,50))
+        font.render('OK', True, (200,100,50))
+        self.assertEqual(self.cache.hits, 1)
+        font.render('OK', True, (255,255,255))
+        self.assertEqual(len(self.cache), 1) # white: gradient text is not cached
+
+class App(unittest.TestCase):
+    def setUp(self):
+        pgui.set_dev_mode(False)
+
+    def test_Dev_mode_of_one_App_does_not_change_another(self):
+        first, second = pgui.App(), pgui.App()
+        with pgui.use_app(first):
+            pgui.set_dev_mode(True)
+            self.assertTrue(pgui.get_dev_mode())
+        with pgui.use_app(second):
+            self.assertFalse(pgui.get_dev_mode())
+        self.assertTrue(first.dev)
+        self.assertFalse(pgui.get_dev_mode()) # default_app is current again
+
+    def test_UI_managers_belong_to_the_current_App(self):
+        app = pgui.App()
+        with pgui.use_app(app):
+            manager = pgui.new_ui_manager(pgui.Window(64,64), theme=None)
+            self.assertEqual(pgui.get_ui_managers(), [manager])
+        self.assertNotIn(manager, pgui.get_ui_managers())
+
+    def test_New_thread_starts_with_the_default_App(self):
+        import threading
+        seen = []
+        with pgui.use_app(pgui.App()):
+            thread = threading.Thread(target=lambda: seen.append(pgui.current_app()))
+            thread.start(); thread.join()
+        self.assertIs(seen[0], pgui.default_app)
+
+class Pipeline(unittest.TestCase):
+    def setUp(self):
+        pixels = np.arange(100.0)
+        self.counts = (1000*np.exp(-(pixels - 40.3)**2/8) + 10).astype(np.uint16)
+
+    def test_Running_average_is_the_mean_of_the_last_n_sweeps(self):
+        pipeline = pgui.Pipeline(3, [pgui.RunningAverage(2)])
+        for value in (1, 2, 6, 10): result = pipeline.process(np.full(3, value))
+        np.testing.assert_allclose(result, 8)
+
+    def test_Input_is_not_modified_and_buffers_are_reused(self):
+        dark = pgui.DarkSubtraction()
+        pipeline = pgui.Pipeline(100, [dark, pgui.ExponentialSmoothing(0.5), pgui.Normalize()])
+        dark.set_dark(np.full(100, 10))
+        self.counts.flags.writeable = False # like a shared memory view
+        first = pipeline.process(self.counts)
+        second = pipeline.process(self.counts)
+        self.assertIs(first, second)
+        self.assertEqual(second.max(), 1.0)
+        self.assertEqual(second[0], 0.0)
+
+    def test_Counts_are_converted_even_with_only_pass_through_stages(self):
+        pipeline = pgui.Pipeline(100, [pgui.PeakTracker(), pgui.Stage()])
+        result = pipeline.process(self.counts)
+        self.assertEqual(result.dtype, np.float64)
+        np.testing.assert_array_equal(result, self.counts)
+        floats = self.counts.astype('f8')
+        self.assertIs(pipeline.process(floats), floats) # already 'dtype': no copy
+
+    def test_Peak_is_found_then_tracked_to_sub_pixel_position(self):
+        peak = pgui.PeakTracker(window=4)
+        pipeline = pgui.Pipeline(100, [peak])
+        published = []
+        pipeline.subscribe(published.append)
+        pipeline.process(self.counts)
+        self.assertAlmostEqual(peak.positions[0], 40.3, delta=0.05)
+        pipeline.process(np.roll(self.counts, 3))
+        self.assertAlmostEqual(peak.positions[0], 43.3, delta=0.05)
+        self.assertEqual(len(published), 2)
+
+class Calibration(unittest.TestCase):
+    def setUp(self):
+        self.coefficients = [339.2, 0.2215, -1.38e-5, -1.2e-10]
+        self.cal = pgui.add_calibration('test-usb4000', self.coefficients, 3648)
+
+    def test_Forward_and_inverse_tables_agree_with_the_polynomial(self):
+        pixels = np.array([0.0, 100.5, 1823.25, 3647.0])
+        wavelengths = np.polynomial.polynomial.polyval(pixels, self.coefficients)
+        np.testing.assert_allclose(self.cal.to_wavelength(pixels), wavelengths, atol=1e-5)
+        np.testing.assert_allclose(self.cal.to_pixel(wavelengths), pixels, atol=1e-3)
+        self.assertTrue(np.isnan(self.cal.to_pixel(100.0)))
+
+    def test_Same_ID_and_coefficients_reuse_the_cached_tables(self):
+        again = pgui.add_calibration('test-usb4000', self.coefficients, 3648)
+        self.assertIs(again, self.cal)
+        self.assertIs(pgui.get_calibration('test-usb4000'), self.cal)
+
+    def test_Resample_onto_a_uniform_wavelength_grid(self):
+        counts = np.arange(3648.0) # counts equal to pixel number
+        grid = self.cal.uniform_grid(step=1.0)
+        resampled = self.cal.resample(counts, grid)
+        np.testing.assert_allclose(resampled, self.cal.to_pixel(grid))
+
+    def test_cal_command_converts_pixels_and_wavelengths(self):
+        response = pgui.evaluate(':cal test-usb4000 0')
+        self.assertEqual(response, 'OK: pixel 0 = 339.20 nm')
+        self.assertTrue(pgui.evaluate(':cal test-usb4000 339.2 nm').startswith('OK: 339.2 nm = pixel 0.00'))
+
+    def test_Integer_pixels_off_the_detector_are_NaN(self):
+        self.assertTrue(np.isnan(self.cal.to_wavelength(-1)))
+        self.assertTrue(np.isnan(self.cal.to_wavelength(3648)))
+        wavelengths = self.cal.to_wavelength(np.array([-1, 0, 3647, 3648]))
+        self.assertEqual(list(np.isnan(wavelengths)), [True, False, False, True])
+        self.assertEqual(wavelengths[1], self.cal.wavelengths[0])
+        self.assertEqual(self.cal.to_wavelength(0), self.cal.wavelengths[0])
+        self.assertTrue(pgui.evaluate(':cal test-usb4000 3648').startswith('ERROR'))
+
+class ThemeWatcher(unittest.TestCase):
+    def setUp(self):
+        import pygame_gui, tempfile
+        pygame.init()
+        pygame.display.set_mode((64,64))
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, 'theme.json')
+        self.write_theme('#4c5052')
+        self.manager = pygame_gui.UIManager((64,64), self.path)
+        self.plain = pygame_gui.elements.UIButton(
+            pygame.Rect(0,0,32,16), 'ok', manager=self.manager)
+        self.special = pygame_gui.elements.UIButton(
+            pygame.Rect(0,16,32,16), 'go', manager=self.manager, object_id='#special')
+        self.watcher = pgui.ThemeWatcher(self.manager)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write_theme(self, special_bg):
+        theme = {
+            'button': {'colours': {'normal_bg': '#25292e'}},
+            '#special': {'colours': {'normal_bg': special_bg}},
+            }
+        with open(self.path, 'w') as file: json.dump(theme, file)
+
+    def test_Only_elements_of_changed_blocks_are_restyled(self):
+        self.write_theme('#ff2c4b')
+        response = self.watcher.reload()
+        self.assertIn('restyled 1 of', response)
+        self.assertEqual(
+            self.manager.get_theme().get_colour(['#special'], ['button'], 'normal_bg'),
+            pygame.Color('#ff2c4b'))
+
+    def test_Check_does_nothing_until_the_file_changes(self):
+        self.assertIsNone(self.watcher.check())
+        self.write_theme('#ff2c4b')
+        os.utime(self.path, ns=(0, 0)) # make sure the stamp differs
+        self.assertTrue(self.watcher.check().startswith('OK'))
+        self.assertEqual(self.watcher.reloads, 1)
+
+class ElementPool(unittest.TestCase):
+    def setUp(self):
+        import pygame_gui
+        pygame.init()
+        pygame.display.set_mode((64,64))
+        self.manager = pygame_gui.UIManager((320,240))
+        self.pool = pgui.ElementPool(self.manager)
+        self.window = pgui.Window(320,240)
+
+    def test_Released_element_is_hidden_then_reused(self):
+        popup = pgui.make_textbox_fullheight_rightside(self.manager, self.window, 'a', 100, self.pool)
+        self.pool.release(popup)
+        self.assertNotIn(popup, self.manager.get_sprite_group())
+        again = pgui.make_textbox_fullheight_rightside(self.manager, self.window, 'b', 120, self.pool)
+        self.assertIs(again, popup)
+        self.assertIn(again, self.manager.get_sprite_group())
+        self.assertEqual(again.html_text, 'b')
+        self.assertEqual(again.rect.width, 120)
+        self.assertEqual(self.pool.stats(), {'created': 1, 'reused': 1, 'free': 0})
+
+    def test_Resized_cmdline_keeps_text_and_colour(self):
+        cmdline = pgui.make_cmdline(self.manager, self.window, 1, self.pool)
+        theme_colour = cmdline.text_colour
+        cmdline.set_text('OK: done')
+        cmdline.text_colour = pygame.Color('#ff2c4b')
+        bigger = pgui.Window(640,480)
+        resized = pgui.resize_cmdline(cmdline, bigger, 1, self.manager, self.pool)
+        self.assertIs(resized, cmdline)
+        self.assertEqual(resized.get_text(), 'OK: done')
+        self.assertEqual(resized.rect, pgui.make_cmdline(self.manager, bigger, 1).rect)
+        self.pool.release(resized)
+        self.assertEqual(resized.text_colour, theme_colour)
+        self.assertEqual(resized.get_text(), '')
+
+    def test_Pooled_resize_creates_no_elements(self):
+        cmdline = pgui.make_cmdline(self.manager, self.window, 1, self.pool)
+        pgui.ui_stats.start() # counts every element made
+        self.addCleanup(pgui.ui_stats.stop)
+        created = pgui.ui_stats.created
+        for cols in range(300, 400, 10):
+            cmdline = pgui.resize_cmdline(cmdline, pgui.Window(cols, 240), 1, self.manager, self.pool)
+        self.assertEqual(pgui.ui_stats.created, created)
+        self.assertEqual(self.pool.stats()['reused'], 10)
+
+    def test_Gapless_height_matches_the_entry_line_font(self):
+        import pygame_gui
+        line = pygame_gui.elements.UITextEntryLine(pygame.Rect(0,0,50,0), self.manager)
+        self.assertEqual(pgui.get_rect_height_for_gapless_cmdline(self.manager),
+                         line.font.size('\n')[1] + 4)
+
+class GridIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = pgui.GridIndex(cell_size=10)
+
+    def test_Point_and_rect_queries_find_only_overlapping_keys(self):
+        self.index.insert('a', (0,0,15,15))
+        self.index.insert('b', (12,12,10,10))
+        self.assertEqual(self.index.query_point((5,5)), {'a'})
+        self.assertEqual(self.index.query_point((13,13)), {'a','b'})
+        self.assertEqual(self.index.query_rect((16,16,2,2)), {'b'})
+
+    def test_Moved_key_leaves_its_old_cells(self):
+        self.index.insert('a', (0,0,5,5))
+        self.index.insert('a', (50,50,5,5))
+        self.assertEqual(self.index.query_point((1,1)), set())
+        self.assertEqual(self.index.query_point((51,51)), {'a'})
+        self.index.remove('a')
+        self.assertEqual(len(self.index), 0)
+
+class IndexedUIManager(unittest.TestCase):
+    def setUp(self):
+        import pygame_gui
+        pygame.init()
+        pygame.display.set_mode((64,64))
+        self.manager = pgui.IndexedUIManager((320,240))
+        self.buttons = [
+            pygame_gui.elements.UIButton(pygame.Rect(40*col,20*row,40,20), 'b', manager=self.manager)
+            for row in range(10) for col in range(8)
+            ]
+
+    def test_Element_at_returns_the_button_under_the_point(self):
+        self.assertIs(self.manager.element_at((45,25)), self.buttons[9])
+        self.buttons[9].kill()
+        self.assertIsNot(self.manager.element_at((45,25)), self.buttons[9])
+
+    def test_Hover_follows_the_mouse(self):
+        self.manager.mouse_position = (45,25)
+        self.manager.update_mouse_position = lambda: None # fake mouse
+        self.manager.update(0.01)
+        self.assertTrue(self.buttons[9].hovered)
+        self.manager.mouse_position = (5,5)
+        self.manager.update(0.01)
+        self.assertFalse(self.buttons[9].hovered)
+        self.assertTrue(self.buttons[0].hovered)
+
+    def test_Relayout_indexes_moved_elements(self):
+        self.buttons[0].rect.topleft = (300,220) # behind the manager's back
+        self.manager.relayout()
+        self.assertIs(self.manager.element_at((305,225)), self.buttons[0])
+
+    def test_Scrolled_textbox_thumb_can_still_be_grabbed(self):
+        # pygame_gui moves the thumb itself (set_position) while scrolling
+        html_text = '<br>'.join(f'line {n}' for n in range(100))
+        textbox = pgui.make_textbox_fullheight_rightside(self.manager, pgui.Window(cols=320, rows=240), html_text, 160)
+        scroll_bar = textbox.scroll_bar
+        thumb = scroll_bar.sliding_button
+        top = thumb.rect.top
+        for frame in range(30):
+            scroll_bar.scroll_wheel_down = True
+            self.manager.update(0.05)
+        self.assertGreater(thumb.rect.top, top)
+        self.assertIs(self.manager.element_at(thumb.rect.center), thumb)
+        down = dict(pos=thumb.rect.center, button=1)
+        self.manager.process_events(pygame.event.Event(pygame.MOUSEBUTTONDOWN, down))
+        self.assertTrue(thumb.held)
+
+    def test_Click_reaches_only_the_element_under_the_point(self):
+        import pygame_gui
+        visited = []
+        for button in self.buttons:
+            def process_event(event, button=button, process_event=button.process_event):
+                visited.append(button)
+                return process_event(event)
+            button.process_event = process_event
+        pygame.event.clear()
+        down = dict(pos=(45,25), button=1)
+        self.manager.process_events(pygame.event.Event(pygame.MOUSEBUTTONDOWN, down))
+        self.assertEqual(visited, [self.buttons[9]])
+        self.assertIs(self.manager.select_focused_element, self.buttons[9])
+        self.manager.process_events(pygame.event.Event(pygame.MOUSEBUTTONUP, down))
+        pressed = [event for event in pygame.event.get(pygame.USEREVENT)
+                   if event.user_type == pygame_gui.UI_BUTTON_PRESSED]
+        self.assertEqual([event.ui_element for event in pressed], [self.buttons[9]])
+        self.assertEqual(visited, [self.buttons[9]]*2)
+
+class Bindings(unittest.TestCase):
+    def setUp(self):
+        import pygame_gui
+        pygame.init()
+        pygame.display.set_mode((64,64))
+        self.manager = pygame_gui.UIManager((320,240))
+        self.line = pygame_gui.elements.UITextEntryLine(pygame.Rect(0,0,200,0), self.manager)
+        self.bindings = pgui.Bindings()
+        self.count = pgui.Observable(0)
+
+    def test_Many_changes_render_once_per_flush(self):
+        self.bindings.bind_text(self.count, self.line, '{} sweeps')
+        renders = []
+        set_text = self.line.set_text
+        self.line.set_text = lambda text: (renders.append(text), set_text(text))
+        for n in range(1000): self.count.set(n)
+        self.assertEqual(self.bindings.flush(), 1)
+        self.assertEqual(renders, ['999 sweeps'])
+        self.assertEqual(self.bindings.flush(), 0) # nothing changed
+
+    def test_Identical_final_value_is_skipped(self):
+        self.bindings.bind_text(self.count, self.line)
+        self.bindings.flush()
+        self.count.set(5)
+        self.count.set(0)
+        self.assertEqual(self.bindings.flush(), 0)
+        self.assertEqual(self.bindings.skipped, 1)
+
+    def test_Colour_and_visibility_follow_the_value(self):
+        status = pgui.Observable('ok')
+        self.bindings.bind_colour(status, self.line, lambda s: '#ff2c4b' if s == 'error' else '#8cffba')
+        self.bindings.bind_visible(status, self.line, lambda s: s != 'hidden')
+        status.set('error')
+        self.bindings.flush()
+        self.assertEqual(self.line.text_colour, pygame.Color('#ff2c4b'))
+        status.set('hidden')
+        self.bindings.flush()
+        self.assertFalse(self.line.alive())
+
+class Script(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        keep_commands(self)
+        pgui.register_command('scripttest', self.record, 'Test command for scripts')
+
+    def record(self, args):
+        self.calls.append(args)
+        return f"ERROR: {args}" if args == 'fail' else f"OK: {args}"
+
+    def test_Loops_and_variables_are_expanded_up_front(self):
+        steps = pgui.compile_script(
+            'set lamp hg\n'
+            '# comment\n'
+            'for nm in range 400 430 10\n'
+            '    :scripttest $lamp ${nm}\n'
+            'end\n'
+            'repeat 2\n'
+            '    for x in a b\n'
+            '        scripttest $x\n'
+            '    end\n'
+            'end\n')
+        self.assertEqual([command.args for number, command in steps],
+                         ['hg 400', 'hg 410', 'hg 420', 'a', 'b', 'a', 'b'])
+        self.assertEqual([number for number, command in steps][:4], [4, 4, 4, 8])
+
+    def test_Range_values_keep_every_digit(self):
+        def values(range_args):
+            steps = pgui.compile_script(f'for v in range {range_args}\n:scripttest $v\nend')
+            return [command.args for number, command in steps]
+        self.assertEqual(values('1000000 1000003'), ['1000000', '1000001', '1000002'])
+        self.assertEqual(values('0 1500000 500000'), ['0', '500000', '1000000'])
+        self.assertEqual(values('123456.5 123458.5'), ['123456.5', '123457.5'])
+        self.assertEqual(values('0 1 0.25'), ['0.0', '0.25', '0.5', '0.75'])
+
+    def test_Compile_errors_name_the_line(self):
+        for text, message in [
+                (':nosuchcommand', "line 1: ':nosuchcommand' is not a registered command"),
+                ('repeat 2\n:scripttest x', "line 1: 'repeat' has no 'end'"),
+                (':scripttest\n:scripttest $nm', "line 2: '$nm' is not set"),
+                ]:
+            with self.assertRaises(pgui.ScriptError) as error: pgui.compile_script(text)
+            self.assertIn(message, str(error.exception))
+
+    def test_Run_is_spread_over_steps_and_stops_at_an_error(self):
+        steps = pgui.compile_script(':scripttest a\n:scripttest b\n:scripttest fail\n:scripttest c')
+        run = pgui.ScriptRun(steps, name='t.mkp')
+        self.assertTrue(run.step(budget=0)) # one command per step
+        self.assertEqual(run.status(), 'OK: t.mkp 1/4')
+        while run.step(budget=0): pass
+        self.assertEqual(self.calls, ['a', 'b', 'fail'])
+        self.assertEqual(run.status(), 'ERROR: t.mkp line 3: fail')
+
+    def test_Runner_runs_from_the_scheduler(self):
+        import tempfile
+        now = [0.0]
+        scheduler = pgui.Scheduler(clock=lambda: now[0])
+        runner = pgui.ScriptRunner(handler=lambda text: 'OK')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cal.mkp')
+            with open(path, 'w') as file: file.write('repeat 100\n:scripttest $n\n:appcommand\nend\n')
+            runner.source(path, {'n': 1}, scheduler)
+        while runner.run.running:
+            now[0] += 1
+            scheduler.run_due()
+        self.assertEqual(len(self.calls), 100)
+        self.assertTrue(runner.status.get().startswith('OK: cal.mkp done, 200 commands'))
+
+class SamplingProfiler(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.profiler = pgui.SamplingProfiler(out_dir=self.tmp.name)
+
+    def tearDown(self):
+        self.profiler.stop()
+        self.tmp.cleanup()
+
+    def busy_loop(self, seconds):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end: pass
+
+    def test_Collapsed_stacks_show_the_busy_function(self):
+        self.profiler.start(rate=500)
+        self.busy_loop(0.2)
+        path = self.profiler.stop()
+        self.assertTrue(path.endswith('.txt'))
+        with open(path) as file: text = file.read()
+        self.assertIn('MainThread;', text)
+        self.assertIn('test_pygameapi:busy_loop', text)
+        self.assertGreater(self.profiler.samples, 10)
+
+    def test_Window_ends_by_itself_and_writes_speedscope(self):
+        self.profiler.start(seconds=0.05, rate=200, fmt='speedscope')
+        self.busy_loop(0.1)
+        self.profiler._thread.join()
+        with open(self.profiler.path) as file: profile = json.load(file)
+        names = {frame['name'] for frame in profile['shared']['frames']}
+        self.assertIn('busy_loop', names)
+        self.assertEqual(profile['profiles'][0]['type'], 'sampled')
+
+class TraceIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.x = np.cumsum(rng.uniform(0.1, 1.0, 5000)) + 300
+        self.y = rng.normal(100, 20, 5000)
+        self.trace = pgui.TraceIndex(self.x, block=16)
+        self.trace.update(self.y)
+
+    def test_Empty_trace_has_empty_regions(self):
+        trace = pgui.TraceIndex()
+        trace.update([])
+        self.assertEqual(trace.region(0, 10).count, 0)
+        self.assertTrue(np.isnan(trace.region(0, 10).mean))
+        with self.assertRaises(ValueError): trace.nearest(0)
+
+    def test_Region_stats_match_reducing_the_slice(self):
+        rng = np.random.default_rng(2)
+        for x0, x1 in rng.uniform(self.x[0] - 5, self.x[-1] + 5, (200, 2)):
+            stats = self.trace.region(x0, x1)
+            inside = (self.x >= min(x0, x1)) & (self.x <= max(x0, x1))
+            self.assertEqual(stats.count, inside.sum())
+            if not stats.count: continue
+            y = self.y[inside]
+            self.assertAlmostEqual(stats.sum, y.sum(), places=6)
+            self.assertAlmostEqual(stats.mean, y.mean(), places=9)
+            self.assertEqual(stats.min, y.min())
+            self.assertEqual(stats.max, y.max())
+            trapezoid = getattr(np, 'trapezoid', None) or np.trapz # renamed in NumPy 2
+            self.assertAlmostEqual(stats.integral, trapezoid(y, self.x[inside]), places=6)
+
+    def test_Nearest_sample_for_the_cursor(self):
+        i, x, y = self.trace.nearest(self.x[10] + 0.01)
+        self.assertEqual((i, x, y), (10, self.x[10], self.y[10]))
+        self.assertEqual(self.trace.nearest(0)[0], 0)
+        self.assertEqual(self.trace.nearest(1e9)[0], 4999)
+
+    def test_Update_copies_the_sweep(self):
+        sweep = np.ones(5000)
+        self.trace.update(sweep)
+        sweep[:] = 5 # caller reuses its buffer
+        self.assertEqual(self.trace.region(self.x[0], self.x[-1]).max, 1)
+
+class WindowSet(unittest.TestCase):
+    def setUp(self):
+        pygame.init()
+        self.windows = pgui.WindowSet(theme=None)
+        self.control = self.windows.open('Control', (320, 240))
+        self.plot = self.windows.open('Plot', (640, 200))
+
+    def tearDown(self):
+        for window in self.windows: window.close()
+
+    def test_Windows_have_own_managers_and_share_the_theme(self):
+        self.assertIsNot(self.control.manager, self.plot.manager)
+        self.assertIs(self.control.manager.get_theme(), self.plot.manager.get_theme())
+        self.assertEqual(self.plot.layout, pgui.Window(cols=640, rows=200))
+        self.assertEqual(self.plot.surface.get_size(), (640, 200))
+
+    def test_Events_go_to_the_window_they_happened_in(self):
+        motion = pygame.event.Event(pygame.MOUSEMOTION, pos=(5,5), rel=(0,0), buttons=(0,0,0), window=self.plot.window)
+        quit = pygame.event.Event(pygame.QUIT)
+        routed = self.windows.process_events([motion, quit])
+        self.assertEqual(routed, [(self.plot, motion), (None, quit)])
+        self.assertTrue(self.plot.manager.has_mouse)
+        self.assertFalse(self.control.manager.has_mouse)
+
+    def test_Close_and_resize_events(self):
+        resized = []
+        self.plot.on_resize = resized.append
+        self.windows.process_events([
+            pygame.event.Event(pygame.WINDOWSIZECHANGED, x=800, y=300, window=self.plot.window),
+            pygame.event.Event(pygame.WINDOWCLOSE, window=self.control.window),
+            ])
+        self.assertEqual(resized, [self.plot])
+        self.assertEqual(self.plot.layout, pgui.Window(cols=800, rows=300))
+        self.assertEqual(list(self.windows), [self.plot])
+        self.windows.draw() # draws and presents the window still open
+
+class LatencyTracer(unittest.TestCase):
+    def setUp(self):
+        pygame.init()
+        pygame.display.set_mode((64,64))
+        self.now = 0.0
+        self.tracer = pgui.LatencyTracer(clock=lambda: self.now)
+        self.tracer.start()
+        pygame.event.clear()
+
+    def tearDown(self):
+        self.tracer.stop()
+        pgui.set_dev_mode(False)
+
+    def test_Keypress_is_timed_from_pump_to_present_through_stages(self):
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SEMICOLON, mod=0))
+        pygame.event.get()
+        self.now = 0.004
+        pgui.evaluate(':help')
+        self.now = 0.010
+        pygame.display.flip()
+        sample, = self.tracer.samples
+        self.assertEqual(sample['kind'], 'key')
+        self.assertAlmostEqual(sample['latency'], 0.010)
+        self.assertAlmostEqual(sample['stages']['evaluate'], 0.004)
+        self.assertEqual(self.tracer.report()['key']['n'], 1)
+
+    def test_Stop_puts_pygame_back(self):
+        self.tracer.stop()
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(1,1), button=1))
+        pygame.event.get()
+        pygame.display.flip()
+        self.assertEqual(len(self.tracer.samples), 0)
+
+    def test_Command_needs_dev_mode_and_reports_percentiles(self):
+        self.assertTrue(pgui.evaluate(':latency').startswith('ERROR'))
+        pgui.set_dev_mode(True)
+        tracer = pgui.latency_tracer # the one ':latency' reports
+        clock, tracer.clock = tracer.clock, lambda: self.now
+        self.addCleanup(setattr, tracer, 'clock', clock)
+        self.addCleanup(tracer.reset)
+        for ms in (5, 10, 40):
+            tracer.pumped([pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(1,1), button=1)])
+            self.now += ms/1000
+            tracer.presented()
+        response = pgui.evaluate(':latency')
+        self.assertTrue(response.startswith('OK: click p50 10.0 ms'), response)
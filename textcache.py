@@ -0,0 +1,155 @@
+"""Shared cache of rendered text Surfaces with a byte budget.
+
+Rendering text is one of the most expensive things a frame does, and
+GUIs render the same strings over and over: numeric labels, status
+lines, repeated command responses. TextCache keeps each rendered Surface
+keyed by (text, font, style, antialias, colour, background) and evicts
+the least recently used Surfaces when the cache goes over its budget.
+
+'new_ui_manager' routes pygame_gui text rendering (command line, text
+boxes) through the shared 'text_cache'. Application labels (plot axes,
+readouts) use 'render_text'.
+
+Example
+-------
+import makeuppy as mukpy
+font = pygame.font.Font(None, 18)
+label = mukpy.render_text(font, f'{wavelength:.1f} nm', True, color_rgb.lightgravel)
+display.blit(label, (x, y)) # blit only: the Surface is shared
+mukpy.text_cache.max_bytes = 32*2**20 # budget
+print(mukpy.text_cache.hits, mukpy.text_cache.misses)
+"""
+import pygame
+from collections import OrderedDict
+
+class TextCache:
+    """LRU cache of 'font.render()' results.
+
+    Behavior
+    --------
+    Rendering the same text, font, style and colours again returns
+    the same Surface
+    Least recently used Surfaces are dropped when the total pixel
+    memory is over 'max_bytes'
+    A Surface bigger than 'max_bytes' is returned but not cached
+    Returned Surfaces are shared: blit them, do not draw on them
+
+    Parameters
+    ----------
+    max_bytes:
+        type: int
+        Budget for the pixel memory of cached Surfaces.
+    """
+    def __init__(self, max_bytes=16*2**20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._surfaces = OrderedDict() # oldest first
+
+    def __len__(self): return len(self._surfaces)
+
+    def render(self, font, text, antialias, colour, background=None): # -> Surface
+        """Return font.render(text, antialias, colour, background), cached."""
+        key = (
+            text, font,
+            font.get_bold(), font.get_italic(), font.get_underline(),
+            bool(antialias), _colour_key(colour), _colour_key(background),
+            )
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        if background is None: surface = font.render(text, antialias, colour)
+        else: surface = font.render(text, antialias, colour, background)
+        size = _bytes(surface)
+        if size <= self.max_bytes:
+            self._surfaces[key] = surface
+            self.bytes += size
+            self._evict()
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+        self.bytes = 0
+
+    def stats(self): # -> dict
+        lookups = self.hits + self.misses
+        return {
+            'surfaces': len(self._surfaces),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits/lookups if lookups else 0.0,
+            }
+
+    def _evict(self):
+        while self.bytes > self.max_bytes:
+            _, surface = self._surfaces.popitem(last=False)
+            self.bytes -= _bytes(surface)
+            self.evictions += 1
+
+class CachedFont:
+    """Wrap a pygame Font so 'render()' goes through a TextCache.
+
+    Everything else (size, metrics, set_underline, ...) goes to the
+    wrapped Font.
+
+    Opaque white text is never cached: pygame_gui renders gradient
+    text in white and then paints the gradient onto the Surface.
+    """
+    _white = (255, 255, 255, 255)
+
+    def __init__(self, font, cache):
+        self.font = font
+        self.cache = cache
+
+    def render(self, text, antialias, colour, background=None): # -> Surface
+        if _colour_key(colour) == self._white:
+            if background is None: return self.font.render(text, antialias, colour)
+            return self.font.render(text, antialias, colour, background)
+        return self.cache.render(self.font, text, antialias, colour, background)
+
+    def __getattr__(self, name): return getattr(self.font, name)
+
+class _CachedFonts(dict):
+    """pygame_gui font dictionary: wrap every Font as it is loaded."""
+    def __init__(self, fonts, cache):
+        super().__init__()
+        self.cache = cache
+        for font_id, font in fonts.items(): self[font_id] = font
+
+    def __setitem__(self, font_id, font):
+        if not isinstance(font, CachedFont): font = CachedFont(font, self.cache)
+        super().__setitem__(font_id, font)
+
+def use_text_cache(manager, cache=None):
+    """Make pygame_gui elements of 'manager' render text through 'cache'.
+
+    'cache' defaults to the shared 'text_cache'.
+    'new_ui_manager' calls this for every manager it makes.
+    Managers sharing a theme (see 'WindowSet') share its fonts:
+    the first call wins.
+    """
+    if cache is None: cache = text_cache
+    font_dictionary = manager.get_theme().get_font_dictionary()
+    if isinstance(font_dictionary.loaded_fonts, _CachedFonts): return
+    font_dictionary.loaded_fonts = _CachedFonts(font_dictionary.loaded_fonts, cache)
+
+def render_text(font, text, antialias, colour, background=None): # -> Surface
+    """Render with the shared 'text_cache'. Blit the result; do not draw on it."""
+    return text_cache.render(font, text, antialias, colour, background)
+
+def _colour_key(colour):
+    if colour is None: return None
+    return tuple(pygame.Color(colour)) # Color, (r,g,b), '#hex' and names match
+
+def _bytes(surface): return surface.get_pitch()*surface.get_height()
+
+# ---Shared cache for every manager and render_text---
+text_cache = TextCache()
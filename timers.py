@@ -0,0 +1,129 @@
+"""One-shot and repeating timers for blinks, timeouts and deferred UI work.
+
+Timers wait in a heap ordered by deadline. Each frame costs O(log n) per
+due timer, not a scan of every pending timer.
+
+Call 'scheduler.run_due()' once per frame, after handling events and
+before drawing. Timer callbacks run there, on the UI thread.
+
+Example
+-------
+import makeuppy as mukpy
+scheduler = mukpy.scheduler
+# Color an ERROR response red for two seconds
+cmdoutput.text_colour = pygame.Color(color_hex.taffy)
+scheduler.call_later(2.0, setattr, cmdoutput, 'text_colour', save_color)
+# Refresh status every half second
+status = scheduler.call_every(0.5, refresh_status)
+# ...later...
+status.cancel()
+
+while not quit:
+    # Sleep until the next event or the next timer, whichever is first
+    event = pygame.event.wait(scheduler.timeout_ms(max_wait_ms=1000))
+    # ...handle event and pygame.event.get()...
+    scheduler.run_due()
+    # ...draw...
+"""
+import heapq
+import itertools
+import time
+
+class Timer:
+    """Handle returned by 'call_later' and 'call_every'. Use it to cancel."""
+    def __init__(self, deadline, interval, func, args):
+        self.deadline = deadline
+        self.interval = interval # None for one-shot timers
+        self.func = func
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """Stop the timer. Cancelling twice or after it ran does nothing."""
+        self.cancelled = True
+
+class Scheduler:
+    """Heap of timers, run by calling 'run_due()' once per frame.
+
+    Behavior
+    --------
+    run_due() calls every timer whose deadline has passed, in
+    deadline order
+    A repeating timer that fell behind runs once, not once per
+    missed interval
+    Timers a callback adds wait for the next run_due(), even with
+    delay 0, so a callback that reschedules itself cannot spin
+    next_deadline() is None if no timers are pending
+    Cancelled timers stay in the heap until they reach the top
+
+    Parameters
+    ----------
+    clock:
+        Function returning the time in seconds. Default: time.monotonic
+    """
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._heap = []
+        self._order = itertools.count() # equal deadlines run in order added
+
+    def __len__(self):
+        return sum(not timer.cancelled for _, _, timer in self._heap)
+
+    def call_later(self, delay, func, *args): # -> Timer
+        """Call func(*args) once, 'delay' seconds from now."""
+        return self._push(Timer(self.clock() + delay, None, func, args))
+
+    def call_every(self, interval, func, *args): # -> Timer
+        """Call func(*args) every 'interval' seconds, starting one interval from now."""
+        if interval <= 0: raise ValueError(f"interval must be positive, not {interval}")
+        return self._push(Timer(self.clock() + interval, interval, func, args))
+
+    def run_due(self, now=None): # -> int
+        """Call timers that are due. Return how many ran."""
+        if now is None: now = self.clock()
+        added_later = next(self._order) # timers added from here on wait for the next call
+        deferred = []
+        ran = 0
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            timer = entry[2]
+            if timer.cancelled: continue
+            if entry[1] > added_later:
+                deferred.append(entry)
+                continue
+            if timer.interval is not None:
+                # Next deadline after 'now' on the original grid
+                missed = (now - timer.deadline)//timer.interval
+                timer.deadline += (missed + 1)*timer.interval
+                self._push(timer)
+            timer.func(*timer.args)
+            ran += 1
+        for entry in deferred: heapq.heappush(self._heap, entry)
+        return ran
+
+    def next_deadline(self): # -> float or None
+        """Return the clock time of the next pending timer."""
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def timeout_ms(self, max_wait_ms=None, now=None): # -> int
+        """Return milliseconds until the next timer, for pygame.event.wait().
+
+        Returns at least 1 when a timer is pending:
+        pygame.event.wait(0) waits for an event with no timeout.
+        Returns 'max_wait_ms' (or 0 if None) when no timers are
+        pending, so the loop sleeps until the next event.
+        """
+        deadline = self.next_deadline()
+        if deadline is None: return max_wait_ms if max_wait_ms is not None else 0
+        if now is None: now = self.clock()
+        wait = max(1, int((deadline - now)*1000 + 0.999)) # round up: don't wake early
+        return wait if max_wait_ms is None else max(1, min(wait, max_wait_ms))
+
+    def _push(self, timer):
+        heapq.heappush(self._heap, (timer.deadline, next(self._order), timer))
+        return timer
+
+# ---Default scheduler for the application---
+scheduler = Scheduler()
@@ -0,0 +1,161 @@
+"""Constant-time cursor readouts and region statistics for plot traces.
+
+Dragging a region across a spectrum and reducing the raw array on
+every mouse motion costs O(points) per frame: too slow for a
+million-point trace at the frame rate.
+
+A TraceIndex is rebuilt once per sweep ('update'), then answers
+queries without visiting the samples in the region:
+
+- sum and mean from a prefix sum of the samples
+- integrated intensity from a prefix sum of trapezoid areas
+- min and max from a sparse table over blocks of 'block' samples:
+  two table lookups for the whole blocks in the region, plus NumPy
+  reductions over the at most two partial blocks at its ends
+- the sample nearest the cursor with 'searchsorted' on the axis
+
+Example
+-------
+import makeuppy as mukpy
+cal = mukpy.get_calibration('usb4000')
+trace = mukpy.TraceIndex(cal.wavelengths)
+pipeline.subscribe(trace.update) # rebuilt once per sweep
+# ...every mouse motion while dragging, x in nm...
+stats = trace.region(drag_start_nm, mouse_nm)
+readout.set_text(f"mean {stats.mean:.1f} max {stats.max:.0f} area {stats.integral:.3g}")
+i, nm, counts = trace.nearest(mouse_nm) # cursor readout
+"""
+from collections import namedtuple
+import numpy as np
+
+RegionStats = namedtuple('RegionStats', [
+    'start', 'stop', 'count', 'sum', 'mean', 'min', 'max', 'integral' ])
+
+class TraceIndex:
+    """Prefix sums and a block sparse table of one trace.
+
+    Behavior
+    --------
+    update() copies the samples: the caller may reuse its buffer
+    (e.g. 'Pipeline.process' output)
+    Buffers are allocated once per trace length
+    region() includes samples whose x is inside [x0, x1], in either
+    order; an empty region has count 0 and NaN statistics
+    'integral' is the trapezoid area between the first and the
+    last sample in the region
+
+    Parameters
+    ----------
+    x:
+        Increasing axis values (e.g. 'Calibration.wavelengths').
+        Default: the sample index.
+    block:
+        Samples per block of the min/max table. Partial blocks at
+        the ends of a region are reduced directly, so queries cost
+        O(block); the table holds about 2*n/block*log2(n/block)
+        values.
+    """
+    def __init__(self, x=None, block=64):
+        self.block = block
+        self.n = 0
+        self.x = None
+        self.y = None # buffers made by the first update()
+        self.updates = 0
+        if x is not None: self.set_axis(x)
+
+    def set_axis(self, x):
+        """Use axis values 'x', one per sample, increasing."""
+        x = np.array(x, dtype='f8')
+        if len(x) > 1 and not np.all(np.diff(x) > 0):
+            raise ValueError("axis values must be increasing")
+        self.x = x
+        self._half_dx = np.diff(x)/2
+        if self.n != len(x): self.n, self.y = 0, None # samples no longer match
+
+    def update(self, y):
+        """Index new samples 'y', e.g. the sweep that just arrived."""
+        y = np.asarray(y)
+        n = len(y)
+        if self.y is None or n != self.n: self._allocate(n)
+        self.y[:] = y
+        np.cumsum(self.y, out=self._sums[1:])
+        if n > 1:
+            np.add(self.y[:-1], self.y[1:], out=self._trapezoids)
+            self._trapezoids *= self._half_dx
+            np.cumsum(self._trapezoids, out=self._areas[1:])
+        for reduce, tables in ((np.minimum, self._mins), (np.maximum, self._maxs)):
+            if not n: break # no blocks, no tables
+            reduce.reduceat(self.y, self._block_starts, out=tables[0])
+            for level in range(1, len(tables)):
+                half = 1 << (level - 1)
+                below = tables[level - 1]
+                reduce(below[:-half], below[half:], out=tables[level])
+        self.updates += 1
+
+    def span(self, x0, x1): # -> (start, stop)
+        """Index range [start, stop) of samples with x in [x0, x1]."""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        if self.x is None:
+            start, stop = int(np.ceil(x0)), int(np.floor(x1)) + 1
+        else:
+            start = int(self.x.searchsorted(x0, 'left'))
+            stop = int(self.x.searchsorted(x1, 'right'))
+        start, stop = max(start, 0), min(stop, self.n)
+        return start, max(start, stop)
+
+    def nearest(self, x): # -> (index, x, y)
+        """Sample nearest axis value 'x', for the cursor readout."""
+        if not self.n: raise ValueError("no samples: call update() first")
+        if self.x is None: i = int(np.clip(np.rint(x), 0, self.n - 1))
+        else:
+            i = int(self.x.searchsorted(x))
+            if i == self.n or (i > 0 and x - self.x[i-1] <= self.x[i] - x): i -= 1
+        return i, (self.x[i] if self.x is not None else i), self.y[i]
+
+    def region(self, x0, x1): # -> RegionStats
+        """Statistics of samples with x in [x0, x1]."""
+        return self.region_of(*self.span(x0, x1))
+
+    def region_of(self, start, stop): # -> RegionStats
+        """Statistics of samples y[start:stop]."""
+        count = stop - start
+        if count <= 0: return RegionStats(start, start, 0, *(np.nan,)*5)
+        total = self._sums[stop] - self._sums[start]
+        return RegionStats(
+            start, stop, count, total, total/count,
+            self._range(start, stop, self._mins, np.min, min),
+            self._range(start, stop, self._maxs, np.max, max),
+            self._areas[stop-1] - self._areas[start],
+            )
+
+    def _range(self, start, stop, tables, reduce, pick): # -> float
+        """Min or max of y[start:stop] from whole blocks plus partial ends."""
+        block = self.block
+        first, last = -(-start//block), stop//block # whole blocks [first, last)
+        if first >= last: return reduce(self.y[start:stop])
+        level = (last - first).bit_length() - 1
+        table = tables[level]
+        found = pick(table[first], table[last - (1 << level)])
+        if start < first*block: found = pick(found, reduce(self.y[start:first*block]))
+        if last*block < stop: found = pick(found, reduce(self.y[last*block:stop]))
+        return found
+
+    def _allocate(self, n):
+        if self.x is not None and len(self.x) != n:
+            raise ValueError(f"trace has {n} samples, axis has {len(self.x)}")
+        self.n = n
+        self.y = np.empty(n, 'f8')
+        self._sums = np.zeros(n + 1, 'f8')
+        self._areas = np.zeros(max(n, 1), 'f8')
+        self._trapezoids = np.empty(max(n - 1, 0), 'f8')
+        if self.x is None: self._half_dx = np.full(max(n - 1, 0), 0.5)
+        self._block_starts = np.arange(0, n, self.block)
+        blocks = len(self._block_starts)
+        # Level k holds the min/max of 2**k blocks starting at each block
+        self._mins, self._maxs = [], []
+        size, level = blocks, 0
+        while size > 0:
+            self._mins.append(np.empty(size, 'f8'))
+            self._maxs.append(np.empty(size, 'f8'))
+            level += 1
+            size = blocks - (1 << level) + 1
@@ -0,0 +1,117 @@
+"""Waterfall (heatmap) of successive sweeps: newest sweep on top.
+
+Each sweep becomes one row of palette indices. Rows go into a circular
+buffer and into an 8-bit Surface whose palette is a badwolf colour
+lookup table, so colouring is done by SDL when the Surface is drawn.
+
+Adding a row writes only that row: cost is O(width), not
+O(width x height). Scrolling moves an offset, not the pixels: 'draw'
+blits the part below the offset, then the part above it.
+
+Example
+-------
+import makeuppy as mukpy
+waterfall = mukpy.Waterfall(pygame.Rect(0,0,512,300), vmin=0, vmax=4095)
+# ...every time a sweep finishes...
+waterfall.add_row(counts) # resampled to the rect width
+# ...every frame...
+waterfall.draw(display)
+"""
+import pygame
+import numpy as np
+from . import makeuppy as _mukpy
+
+# Dark to bright through the badwolf colors
+_badwolf_heat = [
+    'coal', 'deepergravel', 'tardis', 'saltwatertaffy',
+    'lime', 'dalespale', 'orange', 'taffy', 'snow',
+    ]
+
+def badwolf_lut(names=_badwolf_heat, size=256): # -> numpy.ndarray
+    """Return a (size, 3) uint8 colour lookup table blending badwolf 'names'."""
+    color_rgb = _mukpy.ColorRGB()
+    stops = np.array([getattr(color_rgb, name) for name in names], dtype=float)
+    position = np.linspace(0, len(names) - 1, size)
+    return np.stack(
+        [np.interp(position, np.arange(len(names)), stops[:, c]) for c in range(3)],
+        axis=1
+        ).round().astype(np.uint8)
+
+class Waterfall:
+    """Scrolling heatmap of sweeps drawn in 'rect'.
+
+    Behavior
+    --------
+    add_row(counts) writes one row; older rows scroll down on draw
+    Counts at or below vmin get the first colour, at or above vmax
+    the last colour
+    set_range() only changes the colours of rows added afterwards
+
+    Parameters
+    ----------
+    rect:
+        pygame.Rect to draw in. One row per pixel of height, one
+        column per pixel of width.
+    vmin, vmax:
+        Counts mapped to the first and last colour of 'lut'.
+    lut:
+        (n, 3) array of RGB colours, n <= 256. Default: badwolf_lut()
+    """
+    def __init__(self, rect, vmin, vmax, lut=None):
+        self.rect = pygame.Rect(rect)
+        self.lut = badwolf_lut() if lut is None else np.asarray(lut, dtype=np.uint8)
+        self.set_range(vmin, vmax)
+        width, height = self.rect.size
+        self.rows = np.zeros((height, width), dtype=np.uint8) # circular buffer
+        self.head = 0 # row that holds the newest sweep
+        self.count = 0
+        self.surface = pygame.Surface((width, height), depth=8)
+        self.surface.set_palette([tuple(rgb) for rgb in self.lut])
+        self.surface.fill(0)
+        self._columns = {} # {sweep length: index of the sample in each column}
+        self._row = np.empty(width, dtype='f8') # scaled counts: no per-row allocation
+        self._index = np.empty(width, dtype=np.uint8)
+
+    def set_range(self, vmin, vmax):
+        """Map 'vmin' to the first colour and 'vmax' to the last."""
+        if vmax <= vmin: raise ValueError(f"vmax must be more than vmin, got {vmin}, {vmax}")
+        self.vmin = vmin
+        self._scale = (len(self.lut) - 1)/(vmax - vmin)
+
+    def add_row(self, counts):
+        """Colour 'counts' and write them as the newest row."""
+        counts = np.asarray(counts)
+        width = self.rect.width
+        if len(counts) != width: counts = counts[self._sample_index(len(counts))]
+        # In float: unsigned counts below vmin must not wrap around
+        row = np.subtract(counts, self.vmin, out=self._row, dtype='f8')
+        row *= self._scale
+        row += 0.5
+        np.clip(row, 0, len(self.lut) - 1, out=row)
+        index = self._index
+        np.copyto(index, row, casting='unsafe')
+        self.head = (self.head - 1) % self.rect.height # moves up: older rows follow
+        self.rows[self.head] = index
+        # Write only this row of the Surface
+        pygame.surfarray.blit_array(
+            self.surface.subsurface((0, self.head, width, 1)),
+            index[:, np.newaxis]
+            )
+        self.count += 1
+
+    def draw(self, surface):
+        """Blit rows newest-first into 'rect' on 'surface'."""
+        # Newest row is at 'head' and older rows follow it, wrapping
+        # around the end of the buffer: blit head..end, then 0..head.
+        width, height = self.rect.size
+        first = height - self.head
+        surface.blit(self.surface, self.rect.topleft, pygame.Rect(0, self.head, width, first))
+        if self.head:
+            surface.blit(self.surface, (self.rect.left, self.rect.top + first),
+                         pygame.Rect(0, 0, width, self.head))
+
+    def _sample_index(self, length): # -> numpy.ndarray
+        """Nearest sample under each column, for sweeps longer or shorter than 'rect'."""
+        if length not in self._columns:
+            self._columns[length] = np.linspace(0, length - 1, self.rect.width).round().astype(int)
+        return self._columns[length]
@@ -0,0 +1,202 @@
+"""Several windows in one process: a control window plus plot windows.
+
+'make_window' makes the one pygame display. A setup with a control
+window and plot windows on other monitors had to run one process per
+window, each loading its own theme, fonts and images.
+
+A WindowSet opens windows with pygame 2's window API
+(pygame._sdl2.video). Each AppWindow has its own Surface to draw on,
+its own UIManager and its own layout ('Window' size for 'make_cmdline'
+and friends). All managers share one theme: theme data, fonts, images
+and the shape cache are loaded once, and text goes through the App's
+'text_cache'. One event loop gets all events; 'process_events' hands
+each event to the manager of the window it happened in.
+
+Example
+-------
+import makeuppy as mukpy
+windows = mukpy.WindowSet()
+control = windows.open('Control', (640, 480))
+plot = windows.open('Spectrum', (1280, 720), position=(1920, 0)) # second monitor
+cmdline = mukpy.make_cmdline(control.manager, control.layout)
+while windows:
+    for window, event in windows.process_events():
+        if event.type == pygame.WINDOWCLOSE: continue # already closed
+        if window is control and mukpy.user_pressed_enter(...): ...
+    windows.update(clock.tick(60)/1000)
+    plot.surface.fill(color_rgb.blackestgravel)
+    # ...draw the spectrum on plot.surface...
+    windows.draw() # UI of every window, then show
+"""
+import pygame
+import pygame_gui
+from pygame._sdl2 import video # pygame 2 window API: many windows per process
+from pygame_gui.core.ui_appearance_theme import UIAppearanceTheme
+from . import makeuppy as _mukpy
+from .spatial import IndexedUIManager as _IndexedUIManager
+
+class _SharedTheme:
+    """UIManager mixin: use a theme loaded once for many managers.
+
+    Only the manager of the window with the mouse sees the mouse;
+    the others see it outside the window, so they show no hover.
+    """
+    def __init__(self, window_resolution, theme, *args, **kwargs):
+        self._shared_theme = theme
+        self.has_mouse = True
+        super().__init__(window_resolution, None, *args, **kwargs)
+
+    @property
+    def ui_theme(self): return self._shared_theme
+
+    @ui_theme.setter
+    def ui_theme(self, theme): pass # UIManager.__init__ makes its own: keep the shared one
+
+    def update_mouse_position(self):
+        if self.has_mouse: super().update_mouse_position()
+        else: self.mouse_position = (-1, -1)
+
+class SharedThemeUIManager(_SharedTheme, pygame_gui.UIManager):
+    """UIManager using 'theme', a UIAppearanceTheme shared with other managers."""
+
+class IndexedSharedThemeUIManager(_SharedTheme, _IndexedUIManager):
+    """IndexedUIManager using 'theme', shared with other managers."""
+
+class AppWindow:
+    """One window: a Surface to draw on, a UIManager and a layout.
+
+    Made by 'WindowSet.open'.
+
+    Attributes
+    ----------
+    surface:
+        Draw here; 'present()' shows it in the window.
+    manager:
+        UIManager of this window's elements.
+    layout:
+        Window(cols, rows) of this window, for 'make_cmdline' etc.
+    on_resize:
+        Called with this AppWindow after the user resized it,
+        e.g. to call 'resize_cmdline'.
+    """
+    def __init__(self, window_set, title, size, position=None, indexed=False, resizable=False):
+        self.window_set = window_set
+        kwargs = {'resizable': resizable}
+        if position is not None: kwargs['position'] = position
+        self.window = video.Window(title, size=size, **kwargs)
+        self.id = self.window.id
+        self.renderer = video.Renderer(self.window)
+        manager_type = IndexedSharedThemeUIManager if indexed else SharedThemeUIManager
+        self.manager = manager_type(tuple(size), window_set.theme)
+        self.on_resize = None
+        self._make_surface(size)
+
+    @property
+    def title(self): return self.window.title
+
+    def resize(self, size):
+        """Use a new Surface of 'size' after the window was resized."""
+        if tuple(size) == self.layout: return
+        self._make_surface(size)
+        self.manager.set_window_resolution(tuple(size))
+        if self.on_resize is not None: self.on_resize(self)
+
+    def present(self):
+        """Show 'surface' in the window."""
+        self.texture.update(self.surface)
+        self.renderer.clear()
+        self.texture.draw()
+        self.renderer.present()
+
+    def close(self):
+        self.window_set.close(self)
+
+    def _make_surface(self, size):
+        self.layout = _mukpy.Window(cols=size[0], rows=size[1])
+        self.surface = pygame.Surface(size)
+        self.texture = video.Texture(self.renderer, size, streaming=True)
+
+class WindowSet:
+    """Windows sharing one theme and one event loop.
+
+    Behavior
+    --------
+    The theme file is loaded once, by the WindowSet, for all
+    windows
+    Mouse, keyboard and text events go to the manager of the window
+    they happened in; events of no window (QUIT, timers, user
+    events) go to no manager
+    A window the user closes is closed and its elements killed
+    A window the user resizes gets a new Surface and layout
+    A WindowSet is true while it has open windows
+
+    Parameters
+    ----------
+    theme:
+        Theme file for every window (default: the makeuppy theme).
+    """
+    def __init__(self, theme=f'{_mukpy._costume_path}/theme.json'):
+        if not pygame.display.get_init(): pygame.display.init()
+        if not pygame.font.get_init(): pygame.font.init()
+        self.theme = UIAppearanceTheme()
+        if theme is not None: self.theme.load_theme(theme)
+        self.windows = {} # {window id: AppWindow}
+        self._mouse = None # id of the window with the mouse
+
+    def __len__(self): return len(self.windows)
+    def __iter__(self): return iter(list(self.windows.values()))
+
+    def open(self, title='', size=(640, 480), position=None, indexed=False, resizable=False): # -> AppWindow
+        """Open a window with its own UIManager on the shared theme."""
+        window = AppWindow(self, title, size, position, indexed, resizable)
+        app = _mukpy.current_app()
+        _mukpy.use_text_cache(window.manager, app.text_cache) # once per theme, see use_text_cache
+        app.ui_managers.add(window.manager)
+        window.manager.has_mouse = window.id == self._mouse
+        self.windows[window.id] = window
+        return window
+
+    def close(self, window):
+        """Close 'window' and kill its elements."""
+        if self.windows.pop(window.id, None) is None: return
+        for element in window.manager.get_sprite_group().sprites(): element.kill()
+        _mukpy.current_app().ui_managers.discard(window.manager)
+        window.window.destroy()
+        if self._mouse == window.id: self._mouse = None
+
+    def route(self, event): # -> AppWindow or None
+        """Return the window 'event' happened in, or None."""
+        # pygame 2: events of a window have 'window', the video.Window
+        return self.windows.get(getattr(getattr(event, 'window', None), 'id', None))
+
+    def process_events(self, events=None): # -> list of (AppWindow or None, event)
+        """Pass events to the managers of their windows. Return them all.
+
+        'events' defaults to pygame.event.get().
+        """
+        if events is None: events = pygame.event.get()
+        routed = []
+        for event in events:
+            window = self.route(event)
+            if window is not None:
+                if event.type in (pygame.MOUSEMOTION, pygame.WINDOWENTER): self._set_mouse(window.id)
+                elif event.type == pygame.WINDOWLEAVE: self._set_mouse(None)
+                elif event.type == pygame.WINDOWSIZECHANGED: window.resize((event.x, event.y))
+                window.manager.process_events(event)
+                if event.type == pygame.WINDOWCLOSE: self.close(window)
+            routed.append((window, event))
+        return routed
+
+    def update(self, time_delta):
+        """Update the manager of every window."""
+        for window in self: window.manager.update(time_delta)
+
+    def draw(self):
+        """Draw the UI of every window on its surface, then show it."""
+        for window in self:
+            window.manager.draw_ui(window.surface)
+            window.present()
+
+    def _set_mouse(self, window_id):
+        self._mouse = window_id
+        for window in self: window.manager.has_mouse = window.id == window_id